@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Score settlement benchmark.
+
+Seeds a scratch database with closed matches, ledger votes and player ratings,
+then times settle_match_scores() (aggregation + $merge, then the chunked user
+bulk writes). Needs MONGO_URL; never point --db at a real database, it is dropped.
+
+    python bench_settlement.py --votes 1000000 --matches 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default="mvp_bench_settlement")
+    ap.add_argument("--votes", type=int, default=1_000_000)
+    ap.add_argument("--matches", type=int, default=200)
+    ap.add_argument("--player-ratings", type=int, default=100_000)
+    ap.add_argument("--insert-batch", type=int, default=10_000)
+    return ap.parse_args()
+
+
+args = parse_args()
+os.environ["DB_NAME"] = args.db
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import server  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+CATEGORIES = server.categories_for_sport("football") + [server.RATING_LEDGER_CATEGORY]
+CANDIDATES = [f"Player {i}" for i in range(22)]
+
+
+async def insert_batched(coll, docs):
+    batch = []
+    for d in docs:
+        batch.append(d)
+        if len(batch) >= args.insert_batch:
+            await coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await coll.insert_many(batch, ordered=False)
+
+
+async def seed():
+    db = server.db
+    await server.client.drop_database(args.db)
+    await server.ensure_indexes()
+    closed = datetime.now(timezone.utc) - timedelta(minutes=5)
+    # Pin the cutover before the seeded closes and writes so everything is settled
+    await db.meta.insert_one({"_id": server.SETTLEMENT_CUTOVER_ID, "at": closed - timedelta(days=1)})
+    match_ids = [ObjectId() for _ in range(args.matches)]
+    await db.matches.insert_many([
+        {"_id": oid, "sourceId": f"bench-{oid}", "sport": "football", "startTime": closed - timedelta(hours=4), "voting_open_at": closed - timedelta(hours=2), "voting_close_at": closed}
+        for oid in match_ids
+    ])
+    # Every ledger row is a distinct (match, user, category); users vote in every category
+    voters_per_match = max(args.votes // (args.matches * len(CATEGORIES)), 1)
+    user_ids = [ObjectId() for _ in range(voters_per_match)]
+    await insert_batched(db.users, ({"_id": uid, "email": f"{uid}@bench", "score": 0} for uid in user_ids))
+
+    def ledger():
+        n = 0
+        for oid in match_ids:
+            for uid in user_ids:
+                for cat in CATEGORIES:
+                    if n >= args.votes:
+                        return
+                    player = random.choice(["like", "dislike"]) if cat == server.RATING_LEDGER_CATEGORY else random.choice(CANDIDATES)
+                    yield {"matchId": oid, "userId": uid, "category": cat, "player": player, "updatedAt": closed}
+                    n += 1
+
+    def player_ratings():
+        for _ in range(args.player_ratings):
+            doc = {k: random.randint(0, 10) for k in server.PLAYER_RATING_ATTRS}
+            yield {"matchId": random.choice(match_ids), "token": random.choice(user_ids), "player": random.choice(CANDIDATES), "updatedAt": closed, **doc}
+
+    await insert_batched(db.vote_ledger, ledger())
+    await insert_batched(db.player_ratings, player_ratings())
+    return await db.vote_ledger.count_documents({}), len(user_ids)
+
+
+async def main():
+    t0 = time.perf_counter()
+    votes, users = await seed()
+    print(f"seeded {votes} votes, {args.player_ratings} player ratings, {users} users, {args.matches} matches in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    totals = await server.settle_match_scores()
+    elapsed = time.perf_counter() - t0
+    print(f"settled {totals['matches']} matches, {totals['settlements']} score deltas in {elapsed:.2f}s ({votes / elapsed:,.0f} votes/s)")
+
+    # A second pass must find nothing left to apply
+    t0 = time.perf_counter()
+    again = await server.settle_match_scores()
+    print(f"rerun: {again} in {time.perf_counter() - t0:.2f}s")
+    await server.client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,12 +1,16 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReplaceOne, DeleteOne, DeleteMany, CursorType, ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Literal, Union
+from typing import List, Optional, Dict, Literal, Union, Callable
 import uuid
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
@@ -15,6 +19,26 @@ from jose import jwt, JWTError
 from passlib.hash import bcrypt
 from zoneinfo import ZoneInfo
 import re
+import json
+import time
+import hashlib
+import base64
+import socket
+import gzip
+import zlib
+import csv
+import io
+import heapq
+import bisect
+import unicodedata
+from email.utils import format_datetime, parsedate_to_datetime
+from collections import deque
+import numpy as np
+
+try:
+    import brotli  # optional: enables "br" content-encoding
+except ImportError:  # pragma: no cover
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -110,6 +134,29 @@ def with_voting_status(m: Dict) -> Dict:
     }
 
 
+def lifecycle_fields(m: Dict, now: Optional[datetime] = None) -> Dict:
+    # status (scheduled -> live -> finished) and voting_state (pending -> open ->
+    # closed) as of `now`; the lifecycle job advances both at the same boundaries
+    now = now or datetime.now(timezone.utc)
+    comp = compute_final_and_window(m)
+    st = m.get("startTime")
+    if isinstance(st, str):
+        st = datetime.fromisoformat(st)
+    st = to_utc(st)
+    if now < comp["voting_open_at"]:
+        voting_state = "pending"
+    elif now < comp["voting_close_at"]:
+        voting_state = "open"
+    else:
+        voting_state = "closed"
+    status = m.get("status") or "scheduled"
+    if status == "scheduled" and st <= now:
+        status = "live"
+    if status in ("scheduled", "live") and comp["finalAt"] <= now:
+        status = "finished"
+    return {"status": status, "voting_state": voting_state}
+
+
 def to_local_iso(dt: datetime, tz: Optional[str]) -> Optional[str]:
     if not dt:
         return None
@@ -135,19 +182,89 @@ def sanitize(o):
     return o
 
 
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return any((c[2:] if c.startswith("W/") else c) == etag for c in candidates)
+
+
+def encode_cursor(st: datetime, oid: ObjectId) -> str:
+    raw = f"{to_utc(st).isoformat()}|{oid}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        st, oid = raw.split("|", 1)
+        return to_utc(datetime.fromisoformat(st)), ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor_query(cursor: Optional[str]) -> Dict:
+    # Keyset condition for sort [("startTime", 1), ("_id", 1)]
+    if not cursor:
+        return {}
+    st, oid = decode_cursor(cursor)
+    return {"$or": [{"startTime": {"$gt": st}}, {"startTime": st, "_id": {"$gt": oid}}]}
+
+
+def before_cursor_query(cursor: Optional[str]) -> Dict:
+    # Keyset condition for sort [("startTime", -1), ("_id", -1)]
+    if not cursor:
+        return {}
+    st, oid = decode_cursor(cursor)
+    return {"$or": [{"startTime": {"$lt": st}}, {"startTime": st, "_id": {"$lt": oid}}]}
+
+
 async def ensure_indexes():
     await db.matches.create_index("startTime")
     await db.matches.create_index("sourceId", unique=True)
-    await db.matches.create_index("competition_id")
+    await db.matches.create_index([("competition_id", 1), ("startTime", 1), ("_id", 1)])
+    await db.matches.create_index("voting_close_at")
     await db.ratings.create_index("matchId")
     await db.votes.create_index("matchId")
     await db.users.create_index("email", unique=True)
     await db.competitions.create_index([("type", 1), ("country", 1), ("name", 1)])
     await db.competitions.create_index("slug", unique=True, partialFilterExpression={"slug": {"$exists": True}})
+    await db.leases.create_index("expiresAt", expireAfterSeconds=0)
+    await db.match_cards.create_index("startTime")
+    await db.match_cards.create_index([("competition_id", 1), ("startTime", 1), ("_id", 1)])
+    await db.match_cards.create_index([("sport", 1), ("startTime", 1)])
+    await db.match_cards.create_index([("status", 1), ("startTime", 1)])
+    await db.match_cards.create_index([("voting_state", 1), ("voting_close_at", 1)])
+    await db.matches.create_index([("status", 1), ("startTime", 1)])
+    await db.matches.create_index([("status", 1), ("finalAt", 1)])
+    await db.matches.create_index([("voting_state", 1), ("voting_open_at", 1)])
+    await db.matches.create_index([("voting_state", 1), ("voting_close_at", 1)])
+    await db.matches_archive.create_index("startTime")
+    await db.matches_archive.create_index([("competition_id", 1), ("startTime", 1), ("_id", 1)])
+    for coll in ARCHIVED_MATCH_COLLECTIONS:
+        await db[f"{coll}_archive"].create_index("matchId")
+    await db.vote_ledger.create_index([("matchId", 1), ("userId", 1), ("category", 1)], unique=True)
+    await db.matches.create_index([("scoresSettledAt", 1), ("voting_close_at", 1)])
+    await db.score_settlements.create_index([("matchId", 1), ("applied", 1)])
+    await db.score_events.create_index([("userId", 1), ("ts", 1)])
+    await db.player_ratings.create_index([("matchId", 1), ("player", 1)])
+    await db.player_appearances.create_index([("playerId", 1), ("startTime", -1)])
+    await db.player_appearances.create_index("matchId")
+    for coll in (db.matches, db.match_cards, db.matches_archive):
+        await coll.create_index([("homeTeamKey", 1), ("startTime", -1)])
+        await coll.create_index([("awayTeamKey", 1), ("startTime", -1)])
+    await db.match_cards.create_index([("broadcastCountries", 1), ("startTime", 1)])
+    await db.matches.create_index("changeSeq", sparse=True)
+    await db.match_cards.create_index("changeSeq", sparse=True)
+    await db.match_tombstones.create_index("changeSeq")
+    await db.match_tombstones.create_index("deletedAt", expireAfterSeconds=CHANGES_TOMBSTONE_DAYS * 86400)
 
 
 async def backfill_voting_windows():
-    cur = db.matches.find({})
+    # Only documents still missing part of the persisted window
+    cur = db.matches.find({"$or": [{k: {"$exists": False}} for k in ("finalAt", "voting_open_at", "voting_close_at")]})
     async for m in cur:
         comp = compute_final_and_window(m)
         await db.matches.update_one({"_id": m["_id"]}, {"$set": comp})
@@ -190,6 +307,7 @@ async def seed_competitions_and_matches():
         }
         res1 = await db.competitions.insert_one(la_liga)
         res2 = await db.competitions.insert_one(ucl)
+        await bump_competitions_version()
 
         now = datetime.now(timezone.utc)
         def mk_football(hours_from_now: int, comp_id=None, home="Team A", away="Team B", rivalry=None, tournament=None):
@@ -303,36 +421,831 @@ async def seed_competitions_and_matches():
         for m in matches:
             comp = compute_final_and_window(m)
             m.update(comp)
-        await db.matches.insert_many(matches)
+            m.update(lifecycle_fields(m))
+            m.update(derived_match_fields(m))
+        res = await db.matches.insert_many(matches)
+        await match_written(*res.inserted_ids)
+        await sync_player_appearances(res.inserted_ids)
 
 
 @app.on_event("startup")
 async def on_startup():
     try:
+        await detect_mongo_features()
         await ensure_indexes()
-        await backfill_voting_windows()
+        # Pinned before this worker takes votes, which are no longer scored on submit
+        await settlement_cutover()
         await seed_competitions_and_matches()
         await seed_demo_user()
     except Exception as e:
         logger.warning(f"Startup setup failed: {e}")
-    # Minimal background loop placeholder
-    asyncio.create_task(_dispatch_loop())
+    _background_tasks.append(asyncio.create_task(_invalidation_listener()))
+    _background_tasks.append(asyncio.create_task(_leader_loop()))
+    _background_tasks.append(asyncio.create_task(_live_window_loop()))
+    for name, fn, interval in SINGLETON_JOBS:
+        _background_tasks.append(asyncio.create_task(_singleton_loop(name, fn, interval)))
 
 
 # ---------------------------
 # Background dispatcher stubs (notifications omitted)
 # ---------------------------
+DISPATCH_INTERVAL_SECONDS = 90
+
+
 async def _dispatch_now_internal():
     return 0
 
 
-async def _dispatch_loop():
+# ---------------------------
+# Leader election for singleton background jobs
+# ---------------------------
+# Every worker on every replica competes for one lease document in `leases`. The
+# holder renews it every LEADER_HEARTBEAT_SECONDS; if it dies, the lease lapses
+# after LEADER_LEASE_SECONDS and the next heartbeat of another worker takes over.
+LEADER_LEASE_SECONDS = float(os.environ.get("LEADER_LEASE_SECONDS", "15"))
+LEADER_HEARTBEAT_SECONDS = LEADER_LEASE_SECONDS / 3
+LEADER_LEASE_ID = "background-jobs"
+
+leader_state: Dict = {"isLeader": False, "leaseExpiresAt": 0.0, "since": None, "transitions": 0, "lastError": None}
+job_stats: Dict[str, Dict] = {}
+
+
+def is_leader() -> bool:
+    # Trust the lease only while it is still valid by our own clock
+    return leader_state["isLeader"] and time.monotonic() < leader_state["leaseExpiresAt"]
+
+
+async def _try_acquire_lease() -> bool:
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    try:
+        doc = await db.leases.find_one_and_update(
+            {"_id": LEADER_LEASE_ID, "$or": [{"holder": WORKER_ID}, {"expiresAt": {"$lt": now}}]},
+            {"$set": {"holder": WORKER_ID, "expiresAt": now + timedelta(seconds=LEADER_LEASE_SECONDS), "heartbeatAt": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The upsert raced an existing, still valid lease held by someone else
+        return False
+    if not doc or doc.get("holder") != WORKER_ID:
+        return False
+    leader_state["leaseExpiresAt"] = started + LEADER_LEASE_SECONDS
+    return True
+
+
+async def release_leadership():
+    if not leader_state["isLeader"]:
+        return
+    leader_state["isLeader"] = False
+    try:
+        await db.leases.delete_one({"_id": LEADER_LEASE_ID, "holder": WORKER_ID})
+    except Exception as e:
+        logger.warning(f"Lease release failed: {e}")
+
+
+async def _leader_loop():
+    while True:
+        try:
+            acquired = await _try_acquire_lease()
+            leader_state["lastError"] = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            acquired = False
+            leader_state["lastError"] = str(e)
+            logger.warning(f"Leader heartbeat failed: {e}")
+        if acquired != leader_state["isLeader"]:
+            leader_state["transitions"] += 1
+            leader_state["since"] = datetime.now(timezone.utc).isoformat() if acquired else None
+            logger.info(f"Worker {WORKER_ID} {'acquired' if acquired else 'lost'} background-jobs leadership")
+        leader_state["isLeader"] = acquired
+        await asyncio.sleep(LEADER_HEARTBEAT_SECONDS)
+
+
+async def _singleton_loop(name: str, fn: Callable, interval: Optional[float]):
+    # interval=None runs the job once, on whichever worker first becomes leader
+    stats = job_stats.setdefault(name, {"runs": 0, "failures": 0, "lastRunAt": None, "lastDurationMs": None, "lastError": None})
+    while True:
+        if not is_leader():
+            await asyncio.sleep(LEADER_HEARTBEAT_SECONDS)
+            continue
+        started = time.monotonic()
+        try:
+            await fn()
+            stats["lastError"] = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats["failures"] += 1
+            stats["lastError"] = str(e)
+            logger.warning(f"Background job {name} failed: {e}")
+        stats["runs"] += 1
+        stats["lastRunAt"] = datetime.now(timezone.utc).isoformat()
+        stats["lastDurationMs"] = round((time.monotonic() - started) * 1000, 1)
+        if interval is None and stats["lastError"] is None:
+            return
+        await asyncio.sleep(interval or LEADER_HEARTBEAT_SECONDS)
+
+
+# (name, coroutine function, interval seconds or None for run-once)
+SINGLETON_JOBS: List[tuple] = [
+    ("backfill_voting_windows", backfill_voting_windows, None),
+    ("dispatch", _dispatch_now_internal, DISPATCH_INTERVAL_SECONDS),
+]
+
+
+# ---------------------------
+# Local caches & cross-worker invalidation bus
+# ---------------------------
+# Every uvicorn worker keeps its own in-process caches. Write paths publish the
+# affected keys to the capped `cache_events` collection; every worker tails it and
+# evicts by prefix, so caches stay coherent without a separate broker.
+#
+# Key namespaces: "match:<id>" (anything derived from one match), "feed:" (lists,
+# feeds, competition matches), "competitions" (competitions snapshot).
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+CACHE_EVENTS_BYTES = int(os.environ.get("CACHE_EVENTS_BYTES", str(16 * 1024 * 1024)))
+CACHE_EVENTS_MAX_DOCS = int(os.environ.get("CACHE_EVENTS_MAX_DOCS", "100000"))
+LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get("LOCAL_CACHE_MAX_ENTRIES", "5000"))
+BUS_RESUME_OVERLAP_SECONDS = float(os.environ.get("BUS_RESUME_OVERLAP_SECONDS", "5"))
+FEED_KEY = "feed:"
+COMPETITIONS_KEY = "competitions"
+ALL_KEYS = ""  # the empty prefix matches every key
+INDEX_MATCH_KEY = "index:match:"  # published only for writes to `matches`, not for votes
+
+_background_tasks: List[asyncio.Task] = []
+
+
+class LocalCache:
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES):
+        self._data: Dict[str, tuple] = {}
+        # Keys in sorted order, so evicting a prefix only touches the keys under it
+        self._keys: List[str] = []
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Last eviction generation per evicted prefix, kept while fills are running,
+        # so a fill that started before an eviction of its key can tell its result
+        # is already stale
+        self.generation = 0
+        self._evicted_at: Dict[str, int] = {}
+        self._fills: Dict[int, int] = {}
+        self.stale_fills = 0
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._pop(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        if self._data.pop(key, None) is None:
+            bisect.insort(self._keys, key)
+        self._data[key] = (expires_at, value)
+        if len(self._data) > self.max_entries:
+            self._shrink()
+
+    def _pop(self, key: str):
+        if self._data.pop(key, None) is not None:
+            i = bisect.bisect_left(self._keys, key)
+            del self._keys[i]
+
+    def _shrink(self):
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in self._data.items() if exp is not None and exp <= now]:
+            self._pop(k)
+        # Still full: drop the oldest insertions first
+        while len(self._data) > self.max_entries:
+            self._pop(next(iter(self._data)))
+
+    def evict(self, prefix: str) -> int:
+        self.generation += 1
+        if self._fills:
+            self._evicted_at[prefix] = self.generation
+        lo = hi = bisect.bisect_left(self._keys, prefix)
+        while hi < len(self._keys) and self._keys[hi].startswith(prefix):
+            self._data.pop(self._keys[hi], None)
+            hi += 1
+        del self._keys[lo:hi]
+        return hi - lo
+
+    def fill_started(self) -> int:
+        self._fills[self.generation] = self._fills.get(self.generation, 0) + 1
+        return self.generation
+
+    def fill_finished(self, generation: int):
+        left = self._fills.pop(generation, 1) - 1
+        if left:
+            self._fills[generation] = left
+        if not self._fills:
+            self._evicted_at.clear()
+        elif len(self._evicted_at) > self.max_entries:
+            # Nothing running started before the oldest fill: older entries are moot
+            oldest = min(self._fills)
+            self._evicted_at = {p: g for p, g in self._evicted_at.items() if g > oldest}
+
+    def evicted_since(self, key: str, generation: int) -> bool:
+        if generation == self.generation:
+            return False
+        # Every prefix of the key, "" (evict all) included
+        return any(self._evicted_at.get(key[:i], 0) > generation for i in range(len(key) + 1))
+
+    def set_if_fresh(self, key: str, value, ttl: Optional[float], generation: int) -> bool:
+        if self.evicted_since(key, generation):
+            self.stale_fills += 1
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def clear(self):
+        self.evict("")
+
+    def stats(self) -> Dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "staleFills": self.stale_fills}
+
+
+local_cache = LocalCache()
+
+
+class SingleFlight:
+    # Concurrent callers with the same key share one in-flight computation. The
+    # work runs in its own task, so a disconnecting caller does not cancel it for
+    # everybody else waiting on the same key.
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def forget(self, prefix: str):
+        # Later callers start a fresh computation; waiters already on the old one keep it
+        for k in [k for k in self._inflight if k.startswith(prefix)]:
+            self._inflight.pop(k, None)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            "coalescingRatio": round(self.shared / self.calls, 4) if self.calls else 0.0,
+            "inFlight": len(self._inflight),
+        }
+
+
+single_flight = SingleFlight()
+
+# Extra eviction hooks for state that does not live in local_cache
+INVALIDATION_HANDLERS: List[Callable[[List[str]], None]] = []
+
+# name -> callable returning a JSON-able dict, served by /api/metrics
+METRICS_PROVIDERS: Dict[str, Callable[[], Dict]] = {}
+
+_bus_latencies_ms: deque = deque(maxlen=512)
+bus_metrics = {"published": 0, "publishFailures": 0, "received": 0, "evicted": 0, "reconnects": 0}
+
+
+def _apply_invalidation(keys: List[str]) -> int:
+    evicted = 0
+    for k in keys:
+        if k == COMPETITIONS_KEY:
+            _competitions_snapshot["checkedAt"] = 0.0
+        evicted += local_cache.evict(k)
+        single_flight.forget(k)
+    for handler in INVALIDATION_HANDLERS:
+        try:
+            handler(keys)
+        except Exception as e:
+            logger.warning(f"Invalidation handler failed: {e}")
+    return evicted
+
+
+async def publish_invalidation(*keys: str):
+    keys_list = [str(k) for k in keys if k]
+    if not keys_list:
+        return
+    # The writing worker evicts synchronously; the others catch up via the tail
+    _apply_invalidation(keys_list)
+    try:
+        await db.cache_events.insert_one({"keys": keys_list, "origin": WORKER_ID, "sentAt": time.time()})
+        bus_metrics["published"] += 1
+    except Exception as e:
+        bus_metrics["publishFailures"] += 1
+        logger.warning(f"Invalidation publish failed: {e}")
+
+
+async def ensure_cache_events_collection():
+    if await db.list_collection_names(filter={"name": "cache_events"}):
+        return
+    try:
+        await db.create_collection("cache_events", capped=True, size=CACHE_EVENTS_BYTES, max=CACHE_EVENTS_MAX_DOCS)
+        # A tailable cursor on an empty capped collection dies immediately
+        await db.cache_events.insert_one({"keys": [], "origin": WORKER_ID, "sentAt": time.time()})
+    except CollectionInvalid:
+        pass
+
+
+def _on_cache_event(ev: Dict):
+    bus_metrics["received"] += 1
+    if ev.get("origin") != WORKER_ID:
+        bus_metrics["evicted"] += _apply_invalidation(ev.get("keys") or [])
+    # Wall clock across hosts: only meaningful with NTP-synced nodes
+    sent_at = ev.get("sentAt")
+    if isinstance(sent_at, (int, float)):
+        _bus_latencies_ms.append(max((time.time() - sent_at) * 1000, 0.0))
+
+
+async def _invalidation_listener():
     while True:
         try:
-            await _dispatch_now_internal()
+            await ensure_cache_events_collection()
+            last = await db.cache_events.find_one({}, sort=[("$natural", -1)])
+            # Anything published while we were not tailing is unknown: start clean
+            _apply_invalidation([COMPETITIONS_KEY, ALL_KEYS])
+            # ObjectIds from different workers are not ordered within a second, so
+            # resume by publish time with an overlap; replayed evictions are harmless
+            q = {"sentAt": {"$gte": last["sentAt"] - BUS_RESUME_OVERLAP_SECONDS}} if last else {}
+            cursor = db.cache_events.find(q, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for ev in cursor:
+                    _on_cache_event(ev)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.warning(f"Dispatch loop error: {e}")
-        await asyncio.sleep(90)
+            logger.warning(f"Invalidation listener error: {e}")
+        bus_metrics["reconnects"] += 1
+        await asyncio.sleep(1)
+
+
+def _bus_metrics() -> Dict:
+    lat = sorted(_bus_latencies_ms)
+
+    def pct(p: float):
+        return round(lat[min(int(p * len(lat)), len(lat) - 1)], 2) if lat else None
+
+    return {
+        **bus_metrics,
+        "publishToEvictMs": {"p50": pct(0.5), "p99": pct(0.99), "max": round(lat[-1], 2) if lat else None, "samples": len(lat)},
+        "localCache": local_cache.stats(),
+    }
+
+
+METRICS_PROVIDERS["invalidation"] = _bus_metrics
+METRICS_PROVIDERS["singleFlight"] = lambda: single_flight.stats()
+METRICS_PROVIDERS["leader"] = lambda: {**leader_state, "isLeader": is_leader(), "worker": WORKER_ID, "jobs": job_stats}
+
+
+# ---------------------------
+# Response compression & pre-compressed payloads
+# ---------------------------
+# CompressionMiddleware negotiates br/gzip for any compressible response above
+# COMPRESSION_MIN_BYTES. Cacheable payloads (feeds, competitions) are wrapped in a
+# CachedPayload that keeps the raw and compressed bytes together, so popular
+# responses are compressed once per cache fill instead of once per request; the
+# middleware passes those through untouched because they already carry
+# Content-Encoding.
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+# Pre-compressed payloads are built once, so they can afford stronger settings
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = int(os.environ.get("PRECOMPRESS_BROTLI_QUALITY", "9"))
+FEED_CACHE_SECONDS = float(os.environ.get("FEED_CACHE_SECONDS", "15"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+compression_metrics = {"dynamic": 0, "precompressed": 0, "identity": 0, "bytesIn": 0, "bytesOut": 0}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for enc in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(enc, accepted.get("*", 0.0)) > 0:
+            return enc
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str, precompress: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=PRECOMPRESS_BROTLI_QUALITY if precompress else COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 keeps the gzip bytes (and anything hashed from them) deterministic
+    return gzip.compress(data, compresslevel=PRECOMPRESS_GZIP_LEVEL if precompress else COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def json_bytes(payload) -> bytes:
+    return json.dumps(sanitize(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class CachedPayload:
+    __slots__ = ("raw", "etag", "media_type", "headers", "encoded")
+
+    def __init__(self, raw: bytes, media_type: str = "application/json", headers: Optional[Dict[str, str]] = None, etag: Optional[str] = None):
+        self.raw = raw
+        self.media_type = media_type
+        self.headers = headers or {}
+        self.etag = etag or '"' + hashlib.sha1(raw).hexdigest()[:20] + '"'
+        self.encoded: Dict[str, bytes] = {}
+        if len(raw) >= COMPRESSION_MIN_BYTES:
+            self.encoded["gzip"] = compress_bytes(raw, "gzip", precompress=True)
+            if brotli:
+                self.encoded["br"] = compress_bytes(raw, "br", precompress=True)
+
+    @classmethod
+    def from_json(cls, payload, headers: Optional[Dict[str, str]] = None) -> "CachedPayload":
+        return cls(json_bytes(payload), headers=headers)
+
+    def _not_modified(self, request: Request) -> bool:
+        # If-None-Match wins; If-Modified-Since only applies to payloads with a Last-Modified
+        inm = request.headers.get("if-none-match")
+        if inm:
+            return etag_matches(inm, self.etag)
+        ims = request.headers.get("if-modified-since")
+        last_modified = self.headers.get("Last-Modified")
+        if not ims or not last_modified:
+            return False
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+
+    def _body(self, request: Request, headers: Dict[str, str]) -> bytes:
+        enc = negotiate_encoding(request.headers.get("accept-encoding"))
+        if enc in self.encoded:
+            headers["Content-Encoding"] = enc
+            compression_metrics["precompressed"] += 1
+            return self.encoded[enc]
+        return self.raw
+
+    def response(self, request: Request) -> Response:
+        headers = {**self.headers, "ETag": self.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if self._not_modified(request):
+            return Response(status_code=304, headers=headers)
+        body = self._body(request, headers)
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+    def streaming_response(self, request: Request, chunk_size: int) -> Response:
+        # Same validators as response(), but the (possibly precompressed) body goes out in chunks
+        headers = {**self.headers, "ETag": self.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if self._not_modified(request):
+            return Response(status_code=304, headers=headers)
+        body = self._body(request, headers)
+
+        async def chunks():
+            for i in range(0, len(body), chunk_size):
+                yield body[i:i + chunk_size]
+
+        return StreamingResponse(chunks(), media_type=self.media_type, headers=headers)
+
+
+async def cached_payload(key: str, builder: Callable, ttl: Optional[float] = FEED_CACHE_SECONDS, media_type: str = "application/json") -> CachedPayload:
+    # builder is an async callable returning (payload, extra_headers); for
+    # non-JSON media types the payload is the raw body bytes
+    payload = local_cache.get(key)
+    if payload is not None:
+        return payload
+
+    async def fill():
+        generation = local_cache.fill_started()
+        try:
+            body, headers = await builder()
+            if media_type == "application/json":
+                built = CachedPayload.from_json(body, headers=headers)
+            else:
+                built = CachedPayload(body, media_type=media_type, headers=headers)
+            # Not stored when the key was evicted mid-build: the body may predate that write
+            local_cache.set_if_fresh(key, built, ttl, generation)
+            return built
+        finally:
+            local_cache.fill_finished(generation)
+
+    return await single_flight.do(key, fill)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressingResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.passthrough = False
+        self.streaming = False
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self._send)
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start_message["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        ctype = headers.get("content-type", "")
+        return any(ctype.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+    def _stream_chunk(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self.compressor.process(data)
+            return out + (self.compressor.finish() if final else self.compressor.flush())
+        out = self.compressor.compress(data)
+        return out + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = not self._compressible(MutableHeaders(raw=message["headers"]))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if not self.streaming:
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    compression_metrics["identity"] += 1
+                    await self.send(self.start_message)
+                    await self.send(message)
+                    return
+                compressed = compress_bytes(body, self.encoding)
+                compression_metrics["dynamic"] += 1
+                compression_metrics["bytesIn"] += len(body)
+                compression_metrics["bytesOut"] += len(compressed)
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            # Streaming response: compress chunk by chunk, flushing each one
+            self.streaming = True
+            self.compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY) if self.encoding == "br" else zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            compression_metrics["dynamic"] += 1
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self.send(self.start_message)
+        chunk = self._stream_chunk(body, final=not more_body)
+        compression_metrics["bytesIn"] += len(body)
+        compression_metrics["bytesOut"] += len(chunk)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+METRICS_PROVIDERS["compression"] = lambda: {**compression_metrics, "brotli": bool(brotli)}
+
+
+# ---------------------------
+# Admission control & load shedding
+# ---------------------------
+# Each route class gets a concurrency limit, a queue-time budget and a maximum
+# queue length. A request that cannot get a slot within its budget is answered
+# immediately with 503 + Retry-After instead of piling up in the event loop while
+# Mongo is slow. During live voting windows vote writes take priority: feed reads
+# run with a reduced limit and are shed outright while votes are queuing.
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") != "0"
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+ADMISSION_LIVE_FEED_FACTOR = float(os.environ.get("ADMISSION_LIVE_FEED_FACTOR", "0.5"))
+LIVE_WINDOW_CHECK_SECONDS = 30
+
+# class -> (concurrency limit, queue budget ms, max queued)
+ADMISSION_DEFAULTS = {
+    "feed": (64, 250, 256),
+    "detail": (128, 250, 512),
+    "vote": (128, 1000, 1024),
+    "auth": (16, 500, 64),
+    "admin": (8, 2000, 32),
+}
+
+VOTE_PATH_RE = re.compile(r"^/api/matches/[^/]+/(vote|rate|player_ratings)$")
+MATCH_DETAIL_PATH_RE = re.compile(r"^/api/matches/[0-9a-fA-F]{24}(/.*)?$")
+UNGATED_PATHS = {"/api/", "/api/health", "/api/version", "/api/metrics"}
+
+live_window_state: Dict = {"active": False, "checkedAt": None}
+
+
+class AdmissionGate:
+    def __init__(self, name: str, limit: int, queue_ms: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.queue_seconds = queue_ms / 1000.0
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, limit: int, queue_seconds: float) -> bool:
+        if self.in_flight < limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if queue_seconds <= 0 or len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout=queue_seconds)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed over just as the budget ran out: keep it
+                self.admitted += 1
+                return True
+            try:
+                self._waiters.remove(fut)
+            except ValueError:
+                pass
+            self.timed_out += 1
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Handed a slot, then the client went away: pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter, if any
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "inFlight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timedOut": self.timed_out,
+        }
+
+
+def _admission_gate(name: str, defaults: tuple) -> AdmissionGate:
+    env = f"ADMISSION_{name.upper()}"
+    limit, queue_ms, max_queue = defaults
+    return AdmissionGate(
+        name,
+        int(os.environ.get(f"{env}_LIMIT", str(limit))),
+        int(os.environ.get(f"{env}_QUEUE_MS", str(queue_ms))),
+        int(os.environ.get(f"{env}_MAX_QUEUE", str(max_queue))),
+    )
+
+
+admission_gates: Dict[str, AdmissionGate] = {name: _admission_gate(name, d) for name, d in ADMISSION_DEFAULTS.items()}
+
+
+def classify_route(method: str, path: str, headers: Headers) -> Optional[str]:
+    if path in UNGATED_PATHS or not path.startswith("/api/") or method == "OPTIONS":
+        return None
+    if path.startswith("/api/auth/"):
+        return "auth"
+    # Only a valid token jumps to the admin class; anyone can send the header
+    if path.startswith("/api/admin/") or path.startswith("/api/import/") or headers.get("x-admin-token") == ADMIN_TOKEN:
+        return "admin"
+    if method == "POST" and VOTE_PATH_RE.match(path):
+        return "vote"
+    if method not in ("GET", "HEAD"):
+        return "admin"
+    if MATCH_DETAIL_PATH_RE.match(path):
+        return "detail"
+    return "feed"
+
+
+def _admission_budget(name: str, gate: AdmissionGate) -> tuple:
+    limit, queue_seconds = gate.limit, gate.queue_seconds
+    if name == "feed" and live_window_state["active"]:
+        limit = max(1, int(gate.limit * ADMISSION_LIVE_FEED_FACTOR))
+        if admission_gates["vote"].queued:
+            queue_seconds = 0.0
+    return limit, queue_seconds
+
+
+async def _live_window_loop():
+    # Per worker: is any match inside its voting window right now?
+    while True:
+        try:
+            now = datetime.now(timezone.utc)
+            doc = await db.matches.find_one({"voting_close_at": {"$gt": now}, "voting_open_at": {"$lte": now}}, {"_id": 1})
+            live_window_state["active"] = doc is not None
+            live_window_state["checkedAt"] = now.isoformat()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Live window check failed: {e}")
+        await asyncio.sleep(LIVE_WINDOW_CHECK_SECONDS)
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        name = classify_route(scope["method"], scope["path"], Headers(scope=scope))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        gate = admission_gates[name]
+        limit, queue_seconds = _admission_budget(name, gate)
+        if not await gate.acquire(limit, queue_seconds):
+            body = json.dumps({"detail": "Server busy, retry shortly", "reason": "overloaded", "routeClass": name}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"retry-after", str(ADMISSION_RETRY_AFTER_SECONDS).encode("ascii")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+METRICS_PROVIDERS["admission"] = lambda: {
+    "enabled": ADMISSION_ENABLED,
+    "liveWindow": live_window_state,
+    "classes": {name: g.stats() for name, g in admission_gates.items()},
+}
 
 
 # ---------------------------
@@ -483,8 +1396,58 @@ def require_admin(x_admin_token: Optional[str] = Header(default=None, alias="X-A
         raise HTTPException(status_code=401, detail="Admin token required")
 
 
-async def update_user_score(user_id: ObjectId, delta: int):
-    await db.users.update_one({"_id": user_id}, {"$inc": {"score": int(delta)}})
+# Multi-document transactions need a replica set or sharded cluster (Atlas); the
+# dev database is a standalone server. Detected once at startup: without them,
+# run_in_transaction runs the same writes in order and each caller orders its
+# writes so a unique key makes them idempotent.
+mongo_features: Dict = {"transactions": False}
+
+
+async def detect_mongo_features():
+    hello = await client.admin.command("hello")
+    mongo_features["transactions"] = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    if not mongo_features["transactions"]:
+        logger.warning("MongoDB is standalone: vote and score writes run without transactions")
+
+
+async def run_in_transaction(txn: Callable):
+    if not mongo_features["transactions"]:
+        return await txn(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(txn)
+
+
+def score_event(user_id: ObjectId, delta: int, reason: str, ref: str) -> Dict:
+    # Deterministic _id: replaying the same (reason, ref) for a user is a no-op
+    return {"_id": f"{reason}:{ref}:{user_id}", "userId": user_id, "delta": int(delta), "reason": reason, "ref": ref, "ts": datetime.now(timezone.utc)}
+
+
+async def apply_score_events(events: List[Dict]) -> List[Dict]:
+    # Logs the events and $incs users.score in one transaction (Atlas replica set),
+    # so the log and the scores never disagree. Returns only the events that were new.
+    # Without transactions the insert goes first and only the writer whose insert
+    # landed $incs, so a racing replay cannot score an event twice; a crash in
+    # between leaves a logged event unscored, which the reconciler repairs.
+    if not events:
+        return []
+
+    async def txn(session):
+        seen = {d["_id"] async for d in db.score_events.find({"_id": {"$in": [ev["_id"] for ev in events]}}, {"_id": 1}, session=session)}
+        fresh = [ev for ev in events if ev["_id"] not in seen]
+        if fresh:
+            try:
+                await db.score_events.insert_many(fresh, ordered=False, session=session)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if session is not None or any(err.get("code") != 11000 for err in errors):
+                    raise
+                logged = {fresh[err["index"]]["_id"] for err in errors}
+                fresh = [ev for ev in fresh if ev["_id"] not in logged]
+        if fresh:
+            await db.users.bulk_write([UpdateOne({"_id": ev["userId"]}, {"$inc": {"score": ev["delta"]}}) for ev in fresh], ordered=False, session=session)
+        return fresh
+
+    return await run_in_transaction(txn)
 
 
 # -------- Static Config --------
@@ -492,6 +1455,9 @@ THESPORTSDB_KEY = os.environ.get("THESPORTSDB_API_KEY") or os.environ.get("THESP
 SPORT_MAP = {"football": "Soccer", "basketball": "Basketball", "ufc": "Fighting"}
 
 
+PLAYER_RATING_ATTRS = ["attack", "defense", "passing", "dribbling"]
+
+
 def categories_for_sport(sport: str) -> List[str]:
     if sport == "football":
         return ["mvp", "scorer", "assist", "defender", "goalkeeper"]
@@ -526,6 +1492,487 @@ def assert_voting_open_or_raise(match_doc: Dict):
         })
 
 
+# ---------------------------
+# Vote ledger & duplicate filter
+# ---------------------------
+# `vote_ledger` keeps one row per (matchId, userId, category); changing a vote
+# moves the tally from the old candidate to the new one instead of adding to it.
+# In front of it every worker keeps a counting Bloom filter of confirmed votes, so
+# scripted repeats of the same vote cost one indexed point read instead of the
+# match lookup and ledger write. A hit is confirmed against the ledger before the
+# 409, so a false positive (roughly 0.2% at capacity; the filter is cleared once it
+# goes past VOTE_FILTER_CAPACITY) only costs that read. False negatives are
+# harmless: the ledger's unique index has the final word.
+VOTE_FILTER_COUNTERS = int(os.environ.get("VOTE_FILTER_COUNTERS", str(1 << 23)))  # one byte each
+VOTE_FILTER_HASHES = int(os.environ.get("VOTE_FILTER_HASHES", "4"))
+VOTE_FILTER_CAPACITY = int(os.environ.get("VOTE_FILTER_CAPACITY", "500000"))
+RATING_LEDGER_CATEGORY = "rating"
+VOTE_FILTER_KEY = "vote-filter:"
+
+
+class CountingBloomFilter:
+    def __init__(self, size: int, hashes: int, capacity: int):
+        self.size = size
+        self.hashes = hashes
+        self.capacity = capacity
+        self.counters = bytearray(size)
+        self.items = 0
+        self.resets = 0
+        self.hits = 0
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        if self.items >= self.capacity:
+            self.counters = bytearray(self.size)
+            self.items = 0
+            self.resets += 1
+        for pos in self._positions(key):
+            if self.counters[pos] < 255:
+                self.counters[pos] += 1
+        self.items += 1
+
+    def discard(self, key: str):
+        positions = self._positions(key)
+        if not all(self.counters[pos] for pos in positions):
+            return
+        for pos in positions:
+            # Saturated counters are sticky; decrementing them could drop other keys
+            if 0 < self.counters[pos] < 255:
+                self.counters[pos] -= 1
+        self.items = max(self.items - 1, 0)
+
+    def might_contain(self, key: str) -> bool:
+        found = all(self.counters[pos] for pos in self._positions(key))
+        if found:
+            self.hits += 1
+        return found
+
+    def stats(self) -> Dict:
+        return {"items": self.items, "capacity": self.capacity, "bytes": self.size, "hits": self.hits, "resets": self.resets}
+
+
+vote_filter = CountingBloomFilter(VOTE_FILTER_COUNTERS, VOTE_FILTER_HASHES, VOTE_FILTER_CAPACITY)
+
+
+def vote_filter_key(oid: ObjectId, user_id: ObjectId, category: str, player: str) -> str:
+    return f"{oid}:{user_id}:{category}:{player}"
+
+
+def _forget_changed_votes(keys: List[str]):
+    # A vote changed on some worker: its old choice must not look like a repeat here
+    for k in keys:
+        if k.startswith(VOTE_FILTER_KEY):
+            vote_filter.discard(k[len(VOTE_FILTER_KEY):])
+
+
+INVALIDATION_HANDLERS.append(_forget_changed_votes)
+METRICS_PROVIDERS["voteFilter"] = lambda: vote_filter.stats()
+
+
+async def reject_if_repeat_vote(oid: ObjectId, user_id: ObjectId, category: str, player: str):
+    # The filter only rules repeats out; a hit is confirmed against the ledger
+    # so a false positive does not turn away a first vote
+    if not vote_filter.might_contain(vote_filter_key(oid, user_id, category, player)):
+        return
+    if await db.vote_ledger.find_one({"matchId": oid, "userId": user_id, "category": category, "player": player}, {"_id": 1}):
+        raise HTTPException(status_code=409, detail={"reason": "duplicate_vote"})
+
+
+async def record_ledger_vote(oid: ObjectId, user_id: ObjectId, category: str, player: str, tally, tally_inc: Callable[[Optional[str]], Dict]) -> Optional[str]:
+    # Records the choice and applies tally_inc(previous choice) to the match's
+    # tally document in one transaction. Returns the previous choice (None for a
+    # first vote); raises 409 for a repeat. Without transactions the ledger write
+    # still goes first, so a repeat hits the unique key before touching the tally.
+    now = datetime.now(timezone.utc)
+    key = {"matchId": oid, "userId": user_id, "category": category}
+
+    async def txn(session):
+        # Only a different choice matches; the same one falls through to the
+        # upsert, which hits the unique key
+        prev = await db.vote_ledger.find_one_and_update(
+            {**key, "player": {"$ne": player}},
+            {"$set": {"player": player, "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+            session=session,
+        )
+        prev_choice = prev.get("player") if prev else None
+        await tally.update_one({"matchId": oid}, {"$inc": tally_inc(prev_choice)}, upsert=True, session=session)
+        return prev_choice
+
+    try:
+        prev_choice = await run_in_transaction(txn)
+    except DuplicateKeyError:
+        # A repeat, or a concurrent identical vote that won
+        raise HTTPException(status_code=409, detail={"reason": "duplicate_vote"})
+    # Only the write that changed the ledger adds to the filter
+    vote_filter.add(vote_filter_key(oid, user_id, category, player))
+    return prev_choice
+
+
+# ---------------------------
+# Match cards read model
+# ---------------------------
+# `match_cards` holds exactly what the feeds render, precomputed on every match
+# write, so feed latency does not depend on how large match documents (lineups,
+# injuries, ...) grow. Feeds only add per-request bits (voting status, local time).
+CARD_FIELDS = [
+    "sport", "tournament", "subgroup", "homeTeam", "awayTeam", "startTime", "status", "score",
+    "channels", "competition_id", "stadium", "venue", "rivalry", "lineups_status", "source", "voting_state",
+    "updatedAt", "changeSeq",
+]
+CARDS_BACKFILL_BATCH = 500
+
+
+def build_match_card(m: Dict) -> Dict:
+    card = {k: m[k] for k in CARD_FIELDS if k in m}
+    if "channels" in card:
+        # Same keys as broadcastCountries, so a country filter and its lookup agree
+        card["channels"] = normalize_channels(card["channels"])
+    st = m.get("startTime")
+    if isinstance(st, str):
+        st = datetime.fromisoformat(st)
+    card["startTime"] = to_utc(st)
+    card.update(compute_final_and_window(m))
+    card.update(derived_match_fields(m))
+    card["_id"] = m["_id"]
+    card["id"] = str(m["_id"])
+    card["cardUpdatedAt"] = datetime.now(timezone.utc)
+    return card
+
+
+def card_out(card: Dict, tz: Optional[str] = None, country: Optional[str] = None) -> Dict:
+    out = sanitize(card)
+    out.pop("cardUpdatedAt", None)
+    channels = card.get("channels") or {}
+    out["channelsForCountry"] = channels.get(country.upper(), []) if country else []
+    out.update(with_voting_status(card))
+    out["start_time_local"] = to_local_iso(card["startTime"], tz) if tz else None
+    return out
+
+
+def card_replace(m: Dict) -> ReplaceOne:
+    # Only replaces a card built from the same or an older changeSeq; when a racing
+    # writer already stored a newer one the upsert hits the _id and is dropped. A
+    # match never stamped has no seq to compare, so its card is always replaced.
+    if "changeSeq" not in m:
+        return ReplaceOne({"_id": m["_id"]}, build_match_card(m), upsert=True)
+    seq = m["changeSeq"]
+    return ReplaceOne({"_id": m["_id"], "$or": [{"changeSeq": {"$lte": seq}}, {"changeSeq": {"$exists": False}}]}, build_match_card(m), upsert=True)
+
+
+async def write_match_cards(ops: List):
+    try:
+        await db.match_cards.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+
+async def refresh_match_cards(oids: List[ObjectId]):
+    if not oids:
+        return
+    ops = []
+    found = set()
+    async for m in db.matches.find({"_id": {"$in": list(oids)}}):
+        found.add(m["_id"])
+        ops.append(card_replace(m))
+    ops.extend(DeleteOne({"_id": oid}) for oid in oids if oid not in found)
+    await write_match_cards(ops)
+
+
+# Change sequence for delta sync: every match_written stamps the written matches
+# with updatedAt and a changeSeq drawn from one counter document; matches that are
+# gone (deleted or archived) get a tombstone carrying the seq instead.
+CHANGE_SEQ_ID = "changeSeq"
+CHANGES_TOMBSTONE_DAYS = int(os.environ.get("CHANGES_TOMBSTONE_DAYS", "30"))
+
+
+async def allocate_change_seqs(n: int) -> int:
+    # Reserves n consecutive sequence numbers and returns the first
+    doc = await db.meta.find_one_and_update({"_id": CHANGE_SEQ_ID}, {"$inc": {"seq": n}}, upsert=True, return_document=ReturnDocument.AFTER)
+    return doc["seq"] - n + 1
+
+
+async def stamp_match_changes(oids: List[ObjectId]):
+    if not oids:
+        return
+    oids = list(dict.fromkeys(oids))
+    first = await allocate_change_seqs(len(oids))
+    now = datetime.now(timezone.utc)
+    found = {d["_id"] async for d in db.matches.find({"_id": {"$in": oids}}, {"_id": 1})}
+    # $max: a slower concurrent stamp never moves a match back in the sequence, nor
+    # its stamp time back past the safety window of a newer seq
+    stamps = [UpdateOne({"_id": oid}, {"$max": {"changeSeq": first + i, "updatedAt": now}}) for i, oid in enumerate(oids) if oid in found]
+    tombstones = [
+        UpdateOne({"_id": oid}, {"$max": {"changeSeq": first + i, "deletedAt": now}}, upsert=True)
+        for i, oid in enumerate(oids) if oid not in found
+    ]
+    if stamps:
+        await db.matches.bulk_write(stamps, ordered=False)
+        await db.match_tombstones.delete_many({"_id": {"$in": list(found)}})
+    if tombstones:
+        await db.match_tombstones.bulk_write(tombstones, ordered=False)
+
+
+# Matches whose change stamp failed on this worker; stamped again with its next write
+_unstamped: set = set()
+
+
+async def match_written(*oids: ObjectId):
+    # Call after every write to `matches`: keeps the read model and caches in step
+    retried = [oid for oid in _unstamped if oid not in oids]
+    stamped = [*oids, *retried]
+    try:
+        await stamp_match_changes(stamped)
+        _unstamped.difference_update(stamped)
+    except Exception as e:
+        # Until a stamp lands, delta sync cannot see these writes
+        _unstamped.update(oids)
+        retried = []
+        logger.error(f"Change stamping failed for {len(stamped)} matches, retrying with the next write: {e}")
+    try:
+        await refresh_match_cards([*oids, *retried])
+    except Exception as e:
+        logger.warning(f"Match card refresh failed for {len(oids)} matches: {e}")
+    await publish_invalidation(FEED_KEY, *[f"match:{oid}" for oid in oids], *[f"{INDEX_MATCH_KEY}{oid}" for oid in oids])
+
+
+async def backfill_match_cards():
+    batch = []
+    total = 0
+    async for m in db.matches.find({}):
+        batch.append(card_replace(m))
+        if len(batch) >= CARDS_BACKFILL_BATCH:
+            await write_match_cards(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        await write_match_cards(batch)
+        total += len(batch)
+    await publish_invalidation(FEED_KEY)
+    logger.info(f"Match cards backfilled: {total}")
+
+
+SINGLETON_JOBS.append(("backfill_match_cards", backfill_match_cards, None))
+
+
+async def backfill_change_seq():
+    total = 0
+    while True:
+        batch = await db.matches.find({"changeSeq": {"$exists": False}}, {"_id": 1}).limit(CARDS_BACKFILL_BATCH).to_list(CARDS_BACKFILL_BATCH)
+        if not batch:
+            break
+        ids = [d["_id"] for d in batch]
+        await stamp_match_changes(ids)
+        await refresh_match_cards(ids)
+        total += len(ids)
+    if total:
+        await publish_invalidation(FEED_KEY)
+        logger.info(f"Change sequence backfilled: {total}")
+
+
+SINGLETON_JOBS.append(("backfill_change_seq", backfill_change_seq, None))
+
+
+# ---------------------------
+# Search index
+# ---------------------------
+# Per-worker prefix index over team names, lineup/bench player names (hot matches)
+# and competition names. Every word of a name is indexed by its prefixes, so
+# "mad" finds "Real Madrid"; multi-word queries intersect the per-word sets.
+# Matches are reindexed from the INDEX_MATCH_KEY bus events that match_written
+# publishes; a bus (re)connect rebuilds the whole index in the background.
+SEARCH_MAX_PREFIX = int(os.environ.get("SEARCH_MAX_PREFIX", "12"))
+SEARCH_MAX_LIMIT = 50
+SEARCH_TYPES = ("team", "player", "competition")
+SEARCH_MATCH_PROJECTION = {"homeTeam": 1, "awayTeam": 1, "lineup_home": 1, "lineup_away": 1, "bench_home": 1, "bench_away": 1}
+
+
+def search_tokens(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return re.findall(r"\w+", text)
+
+
+def _team_name(t) -> Optional[str]:
+    return t.get("name") if isinstance(t, dict) else t
+
+
+class SearchIndex:
+    def __init__(self):
+        self.entries: Dict[tuple, Dict] = {}
+        self.prefixes: Dict[str, set] = {}
+        self.by_match: Dict[str, set] = {}
+        self.queries = 0
+
+    def _add_entry(self, key: tuple, kind: str, name: str, **extra) -> Dict:
+        entry = self.entries.get(key)
+        if entry is None:
+            tokens = search_tokens(name)
+            entry = {"type": kind, "name": name, "tokens": tokens, "norm": " ".join(tokens), "matches": set(), **extra}
+            self.entries[key] = entry
+            for t in tokens:
+                for i in range(1, min(len(t), SEARCH_MAX_PREFIX) + 1):
+                    self.prefixes.setdefault(t[:i], set()).add(key)
+        return entry
+
+    def _drop_entry(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for t in entry["tokens"]:
+            for i in range(1, min(len(t), SEARCH_MAX_PREFIX) + 1):
+                keys = self.prefixes.get(t[:i])
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.prefixes[t[:i]]
+
+    def index_match(self, m: Dict):
+        mid = str(m["_id"])
+        self.remove_match(mid)
+        keys = set()
+        for team in (_team_name(m.get("homeTeam")), _team_name(m.get("awayTeam"))):
+            norm = " ".join(search_tokens(team or ""))
+            if not norm:
+                continue
+            keys.add(("team", norm))
+            self._add_entry(("team", norm), "team", team)["matches"].add(mid)
+        for field in ("lineup_home", "lineup_away", "bench_home", "bench_away"):
+            for p in m.get(field) or []:
+                name = p.get("name") if isinstance(p, dict) else None
+                if not name or not search_tokens(name):
+                    continue
+                pid = p.get("playerId")
+                key = ("player", pid or " ".join(search_tokens(name)))
+                keys.add(key)
+                self._add_entry(key, "player", name, playerId=pid)["matches"].add(mid)
+        self.by_match[mid] = keys
+
+    def remove_match(self, mid: str):
+        for key in self.by_match.pop(mid, ()):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            entry["matches"].discard(mid)
+            if not entry["matches"]:
+                self._drop_entry(key)
+
+    def set_competitions(self, items: List[Dict]):
+        for key in [k for k in self.entries if k[0] == "competition"]:
+            self._drop_entry(key)
+        for c in items:
+            if c.get("name"):
+                self._add_entry(("competition", str(c["_id"])), "competition", c["name"], id=str(c["_id"]), slug=c.get("slug"), country=c.get("country"))
+
+    def search(self, q: str, limit: int, types: Optional[set] = None) -> List[Dict]:
+        self.queries += 1
+        tokens = search_tokens(q)
+        if not tokens:
+            return []
+        # Smallest prefix set first; longer words are checked against the entry's tokens
+        sets = sorted((self.prefixes.get(t[:SEARCH_MAX_PREFIX], set()) for t in tokens), key=len)
+        candidates = sets[0].intersection(*sets[1:]) if sets[0] else set()
+        norm = " ".join(tokens)
+        hits = []
+        for key in candidates:
+            entry = self.entries[key]
+            if types and entry["type"] not in types:
+                continue
+            if any(len(t) > SEARCH_MAX_PREFIX and not any(w.startswith(t) for w in entry["tokens"]) for t in tokens):
+                continue
+            hits.append(entry)
+        best = heapq.nsmallest(limit, hits, key=lambda e: (not e["norm"].startswith(norm), -len(e["matches"]), e["name"]))
+        out = []
+        for e in best:
+            item = {"type": e["type"], "name": e["name"]}
+            if e["type"] == "competition":
+                item.update({"id": e["id"], "slug": e.get("slug"), "country": e.get("country")})
+            else:
+                item["matches"] = len(e["matches"])
+                if e.get("playerId"):
+                    item["playerId"] = e["playerId"]
+            out.append(item)
+        return out
+
+    def stats(self) -> Dict:
+        return {"entries": len(self.entries), "prefixes": len(self.prefixes), "matches": len(self.by_match), "queries": self.queries}
+
+
+search_index = SearchIndex()
+_search_pending: set = set()
+_search_refresh: Dict[str, Optional[asyncio.Task]] = {"task": None}
+
+
+async def _rebuild_search_index():
+    global search_index
+    fresh = SearchIndex()
+    async for m in db.matches.find({}, SEARCH_MATCH_PROJECTION).batch_size(1000):
+        fresh.index_match(m)
+    snap = await get_competitions_snapshot()
+    fresh.set_competitions(snap["items"])
+    fresh.queries = search_index.queries
+    # Swap in one step so queries never see a half-built index
+    search_index = fresh
+    logger.info(f"Search index rebuilt: {fresh.stats()}")
+
+
+async def _refresh_search_index():
+    while _search_pending:
+        pending = set(_search_pending)
+        _search_pending.clear()
+        try:
+            if ALL_KEYS in pending:
+                await _rebuild_search_index()
+                continue
+            if COMPETITIONS_KEY in pending:
+                pending.discard(COMPETITIONS_KEY)
+                snap = await get_competitions_snapshot()
+                search_index.set_competitions(snap["items"])
+            ids = [ObjectId(x) for x in pending if ObjectId.is_valid(x)]
+            found = {str(m["_id"]): m async for m in db.matches.find({"_id": {"$in": ids}}, SEARCH_MATCH_PROJECTION)}
+            for mid in pending:
+                if mid in found:
+                    search_index.index_match(found[mid])
+                else:
+                    # Deleted or archived
+                    search_index.remove_match(mid)
+        except Exception as e:
+            logger.warning(f"Search index refresh failed: {e}")
+
+
+def _on_search_invalidation(keys: List[str]):
+    for k in keys:
+        if k.startswith(INDEX_MATCH_KEY):
+            _search_pending.add(k[len(INDEX_MATCH_KEY):])
+        elif k in (ALL_KEYS, COMPETITIONS_KEY):
+            _search_pending.add(k)
+    if not _search_pending:
+        return
+    task = _search_refresh["task"]
+    if task is None or task.done():
+        try:
+            _search_refresh["task"] = asyncio.get_running_loop().create_task(_refresh_search_index())
+        except RuntimeError:
+            pass
+
+
+INVALIDATION_HANDLERS.append(_on_search_invalidation)
+METRICS_PROVIDERS["search"] = lambda: {**search_index.stats(), "pending": len(_search_pending)}
+
+
+@api_router.get("/search")
+async def search(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(default=10, ge=1, le=SEARCH_MAX_LIMIT), types: Optional[str] = None):
+    wanted = {t for t in (types or "").split(",") if t in SEARCH_TYPES} or None
+    return {"q": q, "results": search_index.search(q, limit, wanted)}
+
+
 # ---------------------------
 # Health & Auth
 # ---------------------------
@@ -544,6 +1991,17 @@ async def version():
     return {"version": APP_VERSION, "gitSha": GIT_SHA}
 
 
+@api_router.get("/metrics")
+async def metrics(admin=Depends(require_admin)):
+    out: Dict = {"worker": WORKER_ID}
+    for name, provider in METRICS_PROVIDERS.items():
+        try:
+            out[name] = provider()
+        except Exception as e:
+            out[name] = {"error": str(e)}
+    return out
+
+
 @api_router.post("/auth/register")
 async def register(body: RegisterInput):
     existing = await db.users.find_one({"email": body.email.lower()})
@@ -600,49 +2058,243 @@ class CompetitionDB(CompetitionCreate):
         json_encoders = {ObjectId: str, datetime: lambda v: v.isoformat()}
 
 
+# In-process snapshot of all competitions. The data changes a few times a season, so
+# it is rebuilt only when the version marker in `meta` moves; the marker itself is
+# checked at most every COMPETITIONS_VERSION_CHECK_SECONDS.
+COMPETITIONS_VERSION_CHECK_SECONDS = float(os.environ.get("COMPETITIONS_VERSION_CHECK_SECONDS", "30"))
+COMPETITIONS_VERSION_ID = "competitions"
+
+_competitions_snapshot: Dict = {
+    "version": None,
+    "checkedAt": 0.0,
+    "items": [],
+    "byId": {},
+    "bySlug": {},
+    "payload": None,
+    "payloads": {},
+}
+_competitions_lock = asyncio.Lock()
+
+
+async def bump_competitions_version():
+    await db.meta.update_one({"_id": COMPETITIONS_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+    await publish_invalidation(COMPETITIONS_KEY)
+
+
+async def _rebuild_competitions_snapshot(version: int):
+    items = await db.competitions.find({}).sort([("type", 1), ("country", 1), ("name", 1)]).to_list(None)
+    items = [sanitize(it) for it in items]
+    by_id = {it["_id"]: it for it in items}
+    by_slug = {it["slug"]: it for it in items if it.get("slug")}
+    _competitions_snapshot.update({
+        "version": version,
+        "items": items,
+        "byId": by_id,
+        "bySlug": by_slug,
+        "payload": CachedPayload.from_json(items),
+        "payloads": {cid: CachedPayload.from_json(it) for cid, it in by_id.items()},
+    })
+    logger.info(f"Competitions snapshot rebuilt: version={version} items={len(items)}")
+
+
+async def get_competitions_snapshot() -> Dict:
+    snap = _competitions_snapshot
+    if snap["version"] is not None and time.monotonic() - snap["checkedAt"] < COMPETITIONS_VERSION_CHECK_SECONDS:
+        return snap
+    async with _competitions_lock:
+        # Another request may have refreshed while we waited for the lock
+        if snap["version"] is not None and time.monotonic() - snap["checkedAt"] < COMPETITIONS_VERSION_CHECK_SECONDS:
+            return snap
+        marker = await db.meta.find_one({"_id": COMPETITIONS_VERSION_ID}) or {}
+        version = int(marker.get("version", 0))
+        if version != snap["version"]:
+            await _rebuild_competitions_snapshot(version)
+        snap["checkedAt"] = time.monotonic()
+    return snap
+
+
 @api_router.get("/competitions")
-async def list_competitions():
-    items = await db.competitions.find({}).sort([("type", 1), ("country", 1), ("name", 1)]).to_list(1000)
-    for it in items:
-        it["_id"] = str(it["_id"])  # type: ignore
-    return items
+async def list_competitions(request: Request):
+    snap = await get_competitions_snapshot()
+    return snap["payload"].response(request)
 
 
 @api_router.get("/competitions/{comp_id}")
-async def get_competition(comp_id: str):
-    try:
-        oid = ObjectId(comp_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid competition id")
-    c = await db.competitions.find_one({"_id": oid})
+async def get_competition(comp_id: str, request: Request):
+    snap = await get_competitions_snapshot()
+    c = snap["byId"].get(comp_id) or snap["bySlug"].get(comp_id)
     if not c:
+        if not ObjectId.is_valid(comp_id):
+            raise HTTPException(status_code=400, detail="Invalid competition id")
         raise HTTPException(status_code=404, detail="Competition not found")
-    c["_id"] = str(c["_id"])  # type: ignore
-    return c
+    return snap["payloads"][c["_id"]].response(request)
+
+
+@api_router.post("/admin/competitions/refresh")
+async def refresh_competitions(admin=Depends(require_admin)):
+    # For edits made directly in Mongo: move the marker so every worker rebuilds
+    await bump_competitions_version()
+    snap = await get_competitions_snapshot()
+    return {"version": snap["version"], "count": len(snap["items"]), "etag": snap["payload"].etag}
+
+
+COMPETITION_WINDOW_DAYS_BEFORE = int(os.environ.get("COMPETITION_WINDOW_DAYS_BEFORE", "3"))
+COMPETITION_WINDOW_DAYS_AFTER = int(os.environ.get("COMPETITION_WINDOW_DAYS_AFTER", "10"))
+COMPETITION_MATCHES_MAX_LIMIT = 500
 
 
 @api_router.get("/competitions/{comp_id}/matches")
-async def competition_matches(comp_id: str, tz: Optional[str] = Query(default=None)):
+async def competition_matches(
+    comp_id: str,
+    request: Request,
+    tz: Optional[str] = Query(default=None),
+    date_from: Optional[datetime] = Query(default=None, alias="from"),
+    date_to: Optional[datetime] = Query(default=None, alias="to"),
+    limit: int = Query(default=100, ge=1, le=COMPETITION_MATCHES_MAX_LIMIT),
+    cursor: Optional[str] = Query(default=None),
+):
     try:
         oid = ObjectId(comp_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid competition id")
-    cur = db.matches.find({"competition_id": oid}).sort("startTime", 1)
-    out = []
-    async for m in cur:
-        st = m.get("startTime")
-        st_local = None
-        if isinstance(st, str):
-            st = datetime.fromisoformat(st)
-        st = to_utc(st)
-        if tz:
-            st_local = to_local_iso(st, tz)
-        m["_id"] = str(m["_id"])  # type: ignore
-        if "competition_id" in m and m["competition_id"]:
-            m["competition_id"] = str(m["competition_id"])  # type: ignore
-        extra = with_voting_status(m)
-        out.append({**m, **extra, "start_time_local": st_local})
-    return out
+    if date_from is None and date_to is None:
+        # Default "around today" slice so the competition screen paints quickly
+        sod = start_of_day(datetime.now(timezone.utc))
+        date_from = sod - timedelta(days=COMPETITION_WINDOW_DAYS_BEFORE)
+        date_to = sod + timedelta(days=COMPETITION_WINDOW_DAYS_AFTER)
+    window: Dict = {}
+    if date_from is not None:
+        window["$gte"] = to_utc(date_from)
+    if date_to is not None:
+        window["$lt"] = to_utc(date_to)
+    q: Dict = {"competition_id": oid}
+    if window:
+        q["startTime"] = window
+    after = after_cursor_query(cursor)
+    if after:
+        q = {"$and": [q, after]}
+
+    async def build():
+        return await _competition_matches_page(q, limit, tz, date_from, date_to, reaches_archive(date_from))
+
+    key = f"{FEED_KEY}competition:{comp_id}:{tz}:{date_from}:{date_to}:{limit}:{cursor}"
+    payload = await cached_payload(key, build)
+    return payload.response(request)
+
+
+async def _competition_matches_page(q: Dict, limit: int, tz: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime], include_archive: bool = False):
+    # Served by the (competition_id, startTime, _id) index on match_cards and matches_archive
+    cards = await find_cards(q, [("startTime", 1), ("_id", 1)], limit + 1, include_archive)
+    has_more = len(cards) > limit
+    cards = cards[:limit]
+    out = [card_out(c, tz) for c in cards]
+    headers: Dict[str, str] = {}
+    if has_more:
+        last = cards[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["startTime"], last["_id"])
+    if date_from is not None:
+        headers["X-Window-From"] = to_utc(date_from).isoformat()
+    if date_to is not None:
+        headers["X-Window-To"] = to_utc(date_to).isoformat()
+    return out, headers
+
+
+# ---- Competition stats ----
+# Everything is computed inside Mongo: the competition's matches (hot and
+# archived) are the driving set and each tally collection is joined on matchId,
+# so only the top-N rows come back to the worker.
+COMPETITION_STATS_TTL_SECONDS = float(os.environ.get("COMPETITION_STATS_TTL_SECONDS", "300"))
+COMPETITION_STATS_TOP = int(os.environ.get("COMPETITION_STATS_TOP", "10"))
+COMPETITION_STATS_MIN_RATINGS = int(os.environ.get("COMPETITION_STATS_MIN_RATINGS", "3"))
+STATS_MATCH_PROJECTION = {"_id": 1, "homeTeam": 1, "awayTeam": 1, "startTime": 1}
+
+
+def _competition_match_stages(oid: ObjectId) -> List[Dict]:
+    return [
+        {"$match": {"competition_id": oid}},
+        {"$project": STATS_MATCH_PROJECTION},
+        {"$unionWith": {"coll": "matches_archive", "pipeline": [{"$match": {"competition_id": oid}}, {"$project": STATS_MATCH_PROJECTION}]}},
+    ]
+
+
+def _joined_tally_stages(coll: str, project: Dict) -> List[Dict]:
+    # Tally rows for each match from the hot collection and its archive, one per document
+    return [
+        {"$lookup": {"from": coll, "localField": "_id", "foreignField": "matchId", "pipeline": [{"$project": project}], "as": "hot"}},
+        {"$lookup": {"from": f"{coll}_archive", "localField": "_id", "foreignField": "matchId", "pipeline": [{"$project": project}], "as": "archived"}},
+        {"$project": {**STATS_MATCH_PROJECTION, "row": {"$concatArrays": ["$hot", "$archived"]}}},
+        {"$unwind": "$row"},
+    ]
+
+
+def _top_mvp_pipeline(oid: ObjectId) -> List[Dict]:
+    return _competition_match_stages(oid) + _joined_tally_stages("votes", {"_id": 0, "votes.mvp": 1}) + [
+        {"$project": {"mvp": {"$objectToArray": {"$ifNull": ["$row.votes.mvp", {}]}}}},
+        {"$unwind": "$mvp"},
+        {"$group": {"_id": "$mvp.k", "votes": {"$sum": "$mvp.v"}, "matches": {"$sum": 1}}},
+        {"$match": {"votes": {"$gt": 0}}},
+        {"$sort": {"votes": -1, "_id": 1}},
+        {"$limit": COMPETITION_STATS_TOP},
+        {"$project": {"_id": 0, "player": "$_id", "votes": 1, "matches": 1}},
+    ]
+
+
+def _best_rated_pipeline(oid: ObjectId) -> List[Dict]:
+    attrs = {k: 1 for k in PLAYER_RATING_ATTRS}
+    return _competition_match_stages(oid) + _joined_tally_stages("player_ratings", {"_id": 0, "player": 1, **attrs}) + [
+        {"$group": {"_id": "$row.player", "count": {"$sum": 1}, **{k: {"$avg": f"$row.{k}"} for k in PLAYER_RATING_ATTRS}}},
+        {"$match": {"_id": {"$nin": [None, ""]}, "count": {"$gte": COMPETITION_STATS_MIN_RATINGS}}},
+        {"$addFields": {"overall": {"$avg": [f"${k}" for k in PLAYER_RATING_ATTRS]}}},
+        {"$sort": {"overall": -1, "count": -1}},
+        {"$limit": COMPETITION_STATS_TOP},
+        {"$project": {
+            "_id": 0, "player": "$_id", "count": 1, "overall": {"$round": ["$overall", 2]},
+            "averages": {k: {"$round": [f"${k}", 2]} for k in PLAYER_RATING_ATTRS},
+        }},
+    ]
+
+
+def _most_liked_pipeline(oid: ObjectId) -> List[Dict]:
+    return _competition_match_stages(oid) + _joined_tally_stages("ratings", {"_id": 0, "likes": 1, "dislikes": 1}) + [
+        {"$group": {
+            "_id": "$_id", "homeTeam": {"$first": "$homeTeam"}, "awayTeam": {"$first": "$awayTeam"}, "startTime": {"$first": "$startTime"},
+            "likes": {"$sum": {"$ifNull": ["$row.likes", 0]}}, "dislikes": {"$sum": {"$ifNull": ["$row.dislikes", 0]}},
+        }},
+        {"$match": {"likes": {"$gt": 0}}},
+        {"$sort": {"likes": -1, "_id": 1}},
+        {"$limit": COMPETITION_STATS_TOP},
+        {"$addFields": {"likePct": {"$round": [{"$divide": [{"$multiply": ["$likes", 100]}, {"$add": ["$likes", "$dislikes"]}]}, 1]}}},
+    ]
+
+
+@api_router.get("/competitions/{comp_id}/stats")
+async def competition_stats(comp_id: str, request: Request):
+    snap = await get_competitions_snapshot()
+    c = snap["byId"].get(comp_id) or snap["bySlug"].get(comp_id)
+    if not c:
+        if not ObjectId.is_valid(comp_id):
+            raise HTTPException(status_code=400, detail="Invalid competition id")
+        raise HTTPException(status_code=404, detail="Competition not found")
+    oid = ObjectId(c["_id"])
+
+    async def build():
+        mvp, rated, liked = await asyncio.gather(
+            db.matches.aggregate(_top_mvp_pipeline(oid)).to_list(None),
+            db.matches.aggregate(_best_rated_pipeline(oid)).to_list(None),
+            db.matches.aggregate(_most_liked_pipeline(oid)).to_list(None),
+        )
+        for m in liked:
+            m["id"] = str(m.pop("_id"))
+        return sanitize({
+            "competition_id": str(oid),
+            "topMvp": mvp,
+            "bestRatedPlayers": rated,
+            "mostLikedMatches": liked,
+            "generatedAt": datetime.now(timezone.utc),
+        }), {}
+
+    payload = await cached_payload(f"stats:{oid}", build, ttl=COMPETITION_STATS_TTL_SECONDS)
+    return payload.response(request)
 
 
 # ---------------------------
@@ -660,73 +2312,149 @@ async def create_match(match: MatchCreate):
             doc["competition_id"] = None
     comp = compute_final_and_window(doc)
     doc.update(comp)
+    doc.update(lifecycle_fields(doc))
+    doc.update(derived_match_fields(doc))
     if not doc.get("sourceId"):
         doc["sourceId"] = f"manual_{uuid.uuid4()}"
         doc["source"] = "manual"
     res = await db.matches.insert_one(doc)
+    await match_written(res.inserted_id)
+    await sync_player_appearances([res.inserted_id])
     created = await db.matches.find_one({"_id": res.inserted_id})
     created["_id"] = str(created["_id"])  # type: ignore
     return MatchDB(**{**created, **with_voting_status(created)})
 
 
 @api_router.get("/matches")
-async def list_matches(country: Optional[str] = None, sport: Optional[Sport] = None, status: Optional[str] = None, tz: Optional[str] = None):
+async def list_matches(country: Optional[str] = None, sport: Optional[Sport] = None, status: Optional[str] = None, tz: Optional[str] = None, broadcast_only: bool = False):
+    broadcast = broadcast_filter(country, broadcast_only)
+    return await single_flight.do(f"{FEED_KEY}list:{sport}:{status}:{tz}:{broadcast}", lambda: _list_matches(sport, status, tz, broadcast))
+
+
+def broadcast_filter(country: Optional[str], broadcast_only: bool) -> Optional[str]:
+    if not broadcast_only:
+        return None
+    if not country:
+        raise HTTPException(status_code=400, detail="broadcast_only requires country")
+    return country.upper()
+
+
+async def _list_matches(sport: Optional[str], status: Optional[str], tz: Optional[str], broadcast: Optional[str] = None) -> List[Dict]:
     q: Dict = {}
     if sport:
         q["sport"] = sport
     if status:
         q["status"] = status
-    items = await db.matches.find(q).sort("startTime", 1).to_list(1000)
-    out = []
-    for item in items:
-        item["_id"] = str(item["_id"])  # type: ignore
-        if "competition_id" in item and item["competition_id"]:
-            item["competition_id"] = str(item["competition_id"])  # type: ignore
-        extra = with_voting_status(item)
-        st = item.get("startTime")
-        if isinstance(st, str):
-            st = datetime.fromisoformat(st)
-        st = to_utc(st)
-        st_local = to_local_iso(st, tz) if tz else None
-        out.append({**item, **extra, "start_time_local": st_local})
-    return out
+    if broadcast:
+        q["broadcastCountries"] = broadcast
+    # The live list: hot matches only, archived ones are reached by id, team,
+    # player or a competition window
+    cards = await db.match_cards.find(q).sort("startTime", 1).to_list(1000)
+    return [card_out(c, tz) for c in cards]
 
 
 @api_router.get("/matches/grouped")
-async def matches_grouped(country: Optional[str] = None, tz: Optional[str] = None):
+async def matches_grouped(request: Request, country: Optional[str] = None, tz: Optional[str] = None, broadcast_only: bool = False):
+    broadcast = broadcast_filter(country, broadcast_only)
+
+    async def build():
+        return await _build_grouped(country, tz, broadcast), None
+
+    payload = await cached_payload(f"{FEED_KEY}grouped:{country}:{tz}:{broadcast}", build)
+    return payload.response(request)
+
+
+async def _build_grouped(country: Optional[str], tz: Optional[str], broadcast: Optional[str] = None) -> Dict:
     now = datetime.now(timezone.utc)
     sod = start_of_day(now)
     today_end = sod + timedelta(days=1)
     tomorrow_end = sod + timedelta(days=2)
     week_end = sod + timedelta(days=7)
-    items = await db.matches.find({"startTime": {"$gte": sod, "$lte": week_end}}).sort("startTime", 1).to_list(1000)
-
-    def pick_channels(m):
-        if country and country in m.get("channels", {}):
-            ch = m["channels"][country]
-        else:
-            ch = []
-        return ch
+    q: Dict = {"startTime": {"$gte": sod, "$lte": week_end}}
+    if broadcast:
+        # (broadcastCountries, startTime) multikey index
+        q["broadcastCountries"] = broadcast
+    cards = await db.match_cards.find(q).sort("startTime", 1).to_list(1000)
 
     grouped = {"today": [], "tomorrow": [], "week": []}
-    for m in items:
-        st = m["startTime"]
-        if isinstance(st, str):
-            st = datetime.fromisoformat(st)
-        st = to_utc(st)  # Ensure UTC for comparison
+    for c in cards:
+        st = to_utc(c["startTime"])  # Ensure UTC for comparison
         if st <= today_end:
             bucket = "today"
         elif st <= tomorrow_end:
             bucket = "tomorrow"
         else:
             bucket = "week"
-        extra = with_voting_status(m)
-        st_local = to_local_iso(st, tz) if tz else None
-        # Sanitize full match doc to avoid ObjectId/datetime issues
-        m_s = sanitize(m)
-        m_id = m_s.get("_id")
-        grouped[bucket].append({**m_s, "id": str(m_id), "channelsForCountry": pick_channels(m_s), **extra, "start_time_local": st_local})
-    return sanitize(grouped)
+        grouped[bucket].append(card_out(c, tz, country))
+    return grouped
+
+
+VOTING_OPEN_MAX_LIMIT = 500
+
+
+@api_router.get("/matches/voting-open")
+async def matches_voting_open(request: Request, tz: Optional[str] = None, limit: int = Query(default=100, ge=1, le=VOTING_OPEN_MAX_LIMIT)):
+    async def build():
+        now = datetime.now(timezone.utc)
+        # (voting_state, voting_close_at) index; closing soonest first
+        cur = db.match_cards.find({"voting_state": "open", "voting_close_at": {"$gt": now}}).sort("voting_close_at", 1).limit(limit)
+        return [card_out(c, tz) async for c in cur], None
+
+    payload = await cached_payload(f"{FEED_KEY}voting-open:{tz}:{limit}", build)
+    return payload.response(request)
+
+
+CHANGES_MAX_LIMIT = 1000
+# Writers reserve a seq before their stamp lands, so the newest few seconds may
+# still be filling in: the token only advances past changes older than this
+CHANGES_SAFETY_SECONDS = float(os.environ.get("CHANGES_SAFETY_SECONDS", "5"))
+
+
+def encode_changes_token(seq: int) -> str:
+    raw = f"{seq}|{int(time.time())}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_changes_token(token: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+        seq, issued = raw.split("|", 1)
+        return int(seq), int(issued)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid changes token")
+
+
+@api_router.get("/matches/changes")
+async def matches_changes(since: Optional[str] = None, limit: int = Query(default=500, ge=1, le=CHANGES_MAX_LIMIT), tz: Optional[str] = None):
+    seq = 0
+    if since:
+        seq, issued = decode_changes_token(since)
+        if time.time() - issued > CHANGES_TOMBSTONE_DAYS * 86400:
+            # Tombstones older than this are gone: the client must refetch everything
+            raise HTTPException(status_code=410, detail={"reason": "resync_required"})
+    cards = await db.match_cards.find({"changeSeq": {"$gt": seq}}).sort("changeSeq", 1).limit(limit).to_list(limit)
+    tombstones = []
+    if since:
+        tombstones = await db.match_tombstones.find({"changeSeq": {"$gt": seq}}).sort("changeSeq", 1).limit(limit).to_list(limit)
+    rows = sorted([(c["changeSeq"], c) for c in cards] + [(t["changeSeq"], t) for t in tombstones], key=lambda r: r[0])[:limit]
+    stable_before = datetime.now(timezone.utc) - timedelta(seconds=CHANGES_SAFETY_SECONDS)
+    next_seq = seq
+    unstable_at = None
+    for row_seq, doc in rows:
+        stamped = to_utc(doc.get("updatedAt") or doc.get("deletedAt"))
+        if stamped > stable_before:
+            unstable_at = stamped
+            break
+        next_seq = row_seq
+    changed = [card_out(doc, tz) for _, doc in rows if "deletedAt" not in doc]
+    deleted = [str(doc["_id"]) for _, doc in rows if "deletedAt" in doc]
+    out = {"changes": changed, "deleted": deleted, "next": encode_changes_token(next_seq), "hasMore": False}
+    if unstable_at is not None:
+        # The token stopped short of the page: asking again now would not move it
+        out["retryAfter"] = int((unstable_at - stable_before).total_seconds()) + 1
+    else:
+        out["hasMore"] = len(rows) == limit
+    return out
 
 
 @api_router.get("/matches/{match_id}")
@@ -735,7 +2463,13 @@ async def get_match(match_id: str, include: Optional[str] = None, tz: Optional[s
         oid = ObjectId(match_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
-    m = await db.matches.find_one({"_id": oid})
+    # Kickoff stampede: identical detail requests share one find_one + serialization
+    include = "lineups" if include == "lineups" else None
+    return await single_flight.do(f"match:{oid}:detail:{include}:{tz}", lambda: _match_detail(oid, include, tz))
+
+
+async def _match_detail(oid: ObjectId, include: Optional[str], tz: Optional[str]) -> Dict:
+    m = await find_match(oid)
     if not m:
         raise HTTPException(status_code=404, detail="Match not found")
     m["_id"] = str(m["_id"])  # type: ignore
@@ -769,10 +2503,19 @@ async def set_voting_window(match_id: str, body: Dict[str, Optional[str]]):
         updates["voting_close_at"] = to_utc(datetime.fromisoformat(closeAt))
     if not updates:
         raise HTTPException(status_code=400, detail="No updates provided")
-    await db.matches.update_one({"_id": oid}, {"$set": updates})
+    current = await db.matches.find_one({"_id": oid})
+    if not current:
+        raise HTTPException(status_code=404, detail="Match not found")
+    # Moving the window can reopen or close voting right away
+    updates["voting_state"] = lifecycle_fields({**current, **updates})["voting_state"]
+    change = {"$set": updates}
+    if updates["voting_state"] != "closed":
+        # Reopened: settle again at the new close (already settled voters keep their delta)
+        change["$unset"] = {"scoresSettledAt": ""}
+    await db.matches.update_one({"_id": oid}, change)
+    await match_written(oid)
     m = await db.matches.find_one({"_id": oid})
-    m["_id"] = str(m["_id"])  # type: ignore
-    return {**m, **with_voting_status(m)}
+    return sanitize({**m, **with_voting_status(m)})
 
 
 # ---- Rivalry Admin Endpoint ----
@@ -805,6 +2548,7 @@ async def set_rivalry(match_id: str, body: Dict, admin=Depends(require_admin)):
         riv["tag"] = str(tag) if str(tag).strip() else None
     updates["rivalry"] = riv
     await db.matches.update_one({"_id": oid}, {"$set": updates})
+    await match_written(oid)
     m = await db.matches.find_one({"_id": oid})
     m["_id"] = str(m["_id"])  # type: ignore
     return sanitize(m)
@@ -816,7 +2560,11 @@ async def get_rating(match_id: str):
         oid = ObjectId(match_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
-    doc = await db.ratings.find_one({"matchId": oid}) or {}
+    return await single_flight.do(f"match:{oid}:rating", lambda: _rating_summary(oid))
+
+
+async def _rating_summary(oid: ObjectId) -> Dict:
+    doc = await db.ratings.find_one({"matchId": oid}) or await db.ratings_archive.find_one({"matchId": oid}) or {}
     likes = doc.get("likes", 0)
     dislikes = doc.get("dislikes", 0)
     total = max(likes + dislikes, 1)
@@ -829,20 +2577,23 @@ async def rate_match(match_id: str, body: RateInput, current=Depends(get_user_fr
         oid = ObjectId(match_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
+    choice = "like" if body.like else "dislike"
+    await reject_if_repeat_vote(oid, current["_id"], RATING_LEDGER_CATEGORY, choice)
     match_doc = await db.matches.find_one({"_id": oid})
     if not match_doc:
         raise HTTPException(status_code=404, detail="Match not found")
     assert_voting_open_or_raise(match_doc)
-    inc = {"likes": 1} if body.like else {"dislikes": 1}
-    await db.ratings.update_one({"matchId": oid}, {"$inc": inc}, upsert=True)
-    doc = await db.ratings.find_one({"matchId": oid})
-    likes = doc.get("likes", 0)
-    dislikes = doc.get("dislikes", 0)
-    total = max(likes + dislikes, 1)
-    like_pct = round(likes * 100 / total, 1)
-    delta = 1 if (body.like and like_pct >= 50) or ((not body.like) and like_pct < 50) else -1
-    await update_user_score(current["_id"], delta)
-    return {"likes": likes, "dislikes": dislikes, "likePct": like_pct}
+
+    def tally_inc(prev: Optional[str]) -> Dict:
+        inc = {"likes": 1} if body.like else {"dislikes": 1}
+        if prev:
+            inc["dislikes" if body.like else "likes"] = -1
+        return inc
+
+    prev = await record_ledger_vote(oid, current["_id"], RATING_LEDGER_CATEGORY, choice, db.ratings, tally_inc)
+    changed = [f"{VOTE_FILTER_KEY}{vote_filter_key(oid, current['_id'], RATING_LEDGER_CATEGORY, prev)}"] if prev else []
+    await publish_invalidation(f"match:{oid}", *changed)
+    return await _rating_summary(oid)
 
 
 @api_router.post("/matches/{match_id}/vote")
@@ -851,6 +2602,7 @@ async def vote_match(match_id: str, body: VoteInput, current=Depends(get_user_fr
         oid = ObjectId(match_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
+    await reject_if_repeat_vote(oid, current["_id"], body.category, body.player)
 
     match_doc = await db.matches.find_one({"_id": oid})
     if not match_doc:
@@ -860,8 +2612,15 @@ async def vote_match(match_id: str, body: VoteInput, current=Depends(get_user_fr
     if body.category not in allowed:
         raise HTTPException(status_code=400, detail=f"Category '{body.category}' not allowed for this sport")
 
-    path = f"votes.{body.category}.{body.player}"
-    await db.votes.update_one({"matchId": oid}, {"$inc": {path: 1}}, upsert=True)
+    def tally_inc(prev: Optional[str]) -> Dict:
+        inc = {f"votes.{body.category}.{body.player}": 1}
+        if prev:
+            inc[f"votes.{body.category}.{prev}"] = -1
+        return inc
+
+    prev = await record_ledger_vote(oid, current["_id"], body.category, body.player, db.votes, tally_inc)
+    changed = [f"{VOTE_FILTER_KEY}{vote_filter_key(oid, current['_id'], body.category, prev)}"] if prev else []
+    await publish_invalidation(f"match:{oid}", *changed)
 
     if body.token:
         try:
@@ -877,19 +2636,10 @@ async def vote_match(match_id: str, body: VoteInput, current=Depends(get_user_fr
 
     out = {}
     totals = {}
-    delta = 0
     for cat in allowed:
         cnt = doc.get("votes", {}).get(cat, {})
         totals[cat] = sum(cnt.values())
-        pct = to_pct(cnt)
-        out[cat] = pct
-        if cat == body.category:
-            if pct:
-                max_pct = max(pct.values())
-                sel_pct = pct.get(body.player, 0)
-                delta = 1 if sel_pct >= max_pct - 20 else -1
-    if delta != 0:
-        await update_user_score(current["_id"], delta)
+        out[cat] = to_pct(cnt)
     return {"percentages": out, "totals": totals}
 
 
@@ -921,6 +2671,7 @@ async def submit_player_rating(match_id: str, body: Dict, current=Depends(get_us
 
     doc = {"matchId": oid, "player": player, "attack": attack, "defense": defense, "passing": passing, "dribbling": dribbling, "updatedAt": datetime.utcnow()}
     await db.player_ratings.update_one({"matchId": oid, "token": current["_id"], "player": player}, {"$set": {**doc, "token": current["_id"]}}, upsert=True)
+    await publish_invalidation(f"match:{oid}")
 
     cur = db.player_ratings.find({"matchId": oid, "player": player})
     acc = {"attack": 0, "defense": 0, "passing": 0, "dribbling": 0, "count": 0}
@@ -931,25 +2682,111 @@ async def submit_player_rating(match_id: str, body: Dict, current=Depends(get_us
         acc["dribbling"] += r.get("dribbling", 0)
         acc["count"] += 1
     if acc["count"] > 0:
-        av = {k: (acc[k] / acc["count"]) for k in ["attack", "defense", "passing", "dribbling"]}
+        av = {k: (acc[k] / acc["count"]) for k in PLAYER_RATING_ATTRS}
+        # Provisional: what this rating would score against the current averages.
+        # It is credited only at settlement, against the final averages.
         delta = 0
-        for k in ["attack", "defense", "passing", "dribbling"]:
+        for k in PLAYER_RATING_ATTRS:
             diff = abs(doc[k] - av[k])
             if diff <= 2:
                 delta += 1
             elif diff > 3:
                 delta -= 1
-        if delta != 0:
-            await update_user_score(current["_id"], delta)
         overall = (av["attack"] + av["defense"] + av["passing"] + av["dribbling"]) / 4
         return {"count": acc["count"], "averages": {k: round(v, 2) for k, v in av.items()}, "overall": round(overall, 2), "delta": delta}
     else:
         return {"count": 0, "averages": {"attack": 0, "defense": 0, "passing": 0, "dribbling": 0}, "overall": 0, "delta": 0}
 
 
+# Ratings are integers 0..10, so every per-player statistic can be read off a
+# (players x 11) histogram built with one bincount per attribute; "overall" is the
+# per-rating sum of the four attributes (0..40, i.e. quarter points).
+PLAYER_RATING_QUANTILES = {"p10": 0.1, "median": 0.5, "p90": 0.9}
+PLAYER_RATING_BATCH = 10000
+
+
+def _hist_stats(hist: np.ndarray, scale: float = 1.0) -> Dict[str, np.ndarray]:
+    # hist: (players, bins) counts of integer values; quantiles use numpy's linear interpolation
+    counts = hist.sum(axis=1)
+    values = np.arange(hist.shape[1])
+    out = {"mean": (hist @ values) / counts / scale}
+    cum = np.cumsum(hist, axis=1)
+    for name, q in PLAYER_RATING_QUANTILES.items():
+        pos = q * (counts - 1)
+        lo, hi = np.floor(pos), np.ceil(pos)
+        # value at sorted index k = number of bins whose cumulative count is <= k
+        v_lo = (cum <= lo[:, None]).sum(axis=1)
+        v_hi = (cum <= hi[:, None]).sum(axis=1)
+        out[name] = (v_lo + (v_hi - v_lo) * (pos - lo)) / scale
+    return out
+
+
+def summarize_player_ratings(names: List[str], codes: np.ndarray, scores: np.ndarray) -> List[Dict]:
+    # codes: (n,) index into names per rating; scores: (n, 4) ints in PLAYER_RATING_ATTRS order
+    g = len(names)
+    counts = np.bincount(codes, minlength=g)
+    stats = {}
+    hists = {}
+    for i, attr in enumerate(PLAYER_RATING_ATTRS):
+        hists[attr] = np.bincount(codes * 11 + scores[:, i], minlength=g * 11).reshape(g, 11)
+        stats[attr] = _hist_stats(hists[attr])
+    overall = np.bincount(codes * 41 + scores.sum(axis=1), minlength=g * 41).reshape(g, 41)
+    stats["overall"] = _hist_stats(overall, scale=len(PLAYER_RATING_ATTRS))
+    out = []
+    for j in np.argsort(-stats["overall"]["mean"], kind="stable"):
+        row = {"player": names[j], "count": int(counts[j])}
+        for attr in PLAYER_RATING_ATTRS:
+            row[attr] = {k: round(float(v[j]), 2) for k, v in stats[attr].items()}
+            row[attr]["histogram"] = hists[attr][j].tolist()
+        row["overall"] = {k: round(float(v[j]), 2) for k, v in stats["overall"].items()}
+        out.append(row)
+    return out
+
+
+async def _player_ratings_summary(oid: ObjectId) -> Dict:
+    projection = {"_id": 0, "player": 1, **{k: 1 for k in PLAYER_RATING_ATTRS}}
+    index: Dict[str, int] = {}
+    codes: List[int] = []
+    columns: List[List[int]] = [[] for _ in PLAYER_RATING_ATTRS]
+    for coll in ("player_ratings", "player_ratings_archive"):
+        async for r in db[coll].find({"matchId": oid}, projection).batch_size(PLAYER_RATING_BATCH):
+            player = r.get("player")
+            if not player:
+                continue
+            codes.append(index.setdefault(player, len(index)))
+            for col, attr in zip(columns, PLAYER_RATING_ATTRS):
+                col.append(r.get(attr, 0))
+    if not codes:
+        return {"matchId": str(oid), "count": 0, "players": []}
+    scores = np.clip(np.array(columns, dtype=np.int64).T, 0, 10)
+    return {"matchId": str(oid), "count": len(codes), "players": summarize_player_ratings(list(index), np.array(codes), scores)}
+
+
+@api_router.get("/matches/{match_id}/player_ratings/summary")
+async def player_ratings_summary(match_id: str, request: Request):
+    try:
+        oid = ObjectId(match_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid match id")
+    if not await find_match(oid, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    async def build():
+        return await _player_ratings_summary(oid), {}
+
+    # No TTL: every rating write publishes match:<id>, which evicts this entry
+    payload = await cached_payload(f"match:{oid}:player_ratings:summary", build, ttl=None)
+    return payload.response(request)
+
+
 # ---------------------------
 # Lineups & Injuries API
 # ---------------------------
+LINEUPS_FIELDS = ["formation_home", "formation_away", "lineup_home", "lineup_away", "bench_home", "bench_away", "lineups_status"]
+INJURIES_FIELDS = ["unavailable_home", "unavailable_away"]
+BULK_LINEUPS_MAX_ITEMS = int(os.environ.get("BULK_LINEUPS_MAX_ITEMS", "500"))
+
+
 async def _get_lineups_payload(m: Dict) -> Dict:
     return {
         "lineups_status": m.get("lineups_status", "none"),
@@ -976,7 +2813,11 @@ async def get_lineups(match_id: str):
         oid = ObjectId(match_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
-    m = await db.matches.find_one({"_id": oid})
+    return await single_flight.do(f"match:{oid}:lineups", lambda: _lineups_for(oid))
+
+
+async def _lineups_for(oid: ObjectId) -> Dict:
+    m = await find_match(oid)
     if not m:
         raise HTTPException(status_code=404, detail="Match not found")
     return await _get_lineups_payload(m)
@@ -989,15 +2830,15 @@ async def post_lineups(match_id: str, body: Dict, admin=Depends(require_admin)):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
     updates = {}
-    for key in [
-        "formation_home", "formation_away", "lineup_home", "lineup_away", "bench_home", "bench_away", "lineups_status"
-    ]:
+    for key in LINEUPS_FIELDS:
         if key in body:
             updates[key] = body[key]
     updates["lineups_updated_at"] = datetime.now(timezone.utc)
     if not updates:
         raise HTTPException(status_code=400, detail="No lineups fields provided")
     await db.matches.update_one({"_id": oid}, {"$set": updates})
+    await match_written(oid)
+    await sync_player_appearances([oid])
     m = await db.matches.find_one({"_id": oid})
     return await _get_lineups_payload(m)
 
@@ -1009,17 +2850,1051 @@ async def post_injuries(match_id: str, body: Dict, admin=Depends(require_admin))
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid match id")
     updates = {}
-    for key in ["unavailable_home", "unavailable_away"]:
+    for key in INJURIES_FIELDS:
         if key in body:
             updates[key] = body[key]
     updates["injuries_updated_at"] = datetime.now(timezone.utc)
     if not updates:
         raise HTTPException(status_code=400, detail="No injuries fields provided")
     await db.matches.update_one({"_id": oid}, {"$set": updates})
+    await match_written(oid)
     m = await db.matches.find_one({"_id": oid})
     return await _get_lineups_payload(m)
 
 
+class BulkLineupsItem(BaseModel):
+    match_id: str
+    formation_home: Optional[str] = None
+    formation_away: Optional[str] = None
+    lineup_home: Optional[List[Dict]] = None
+    lineup_away: Optional[List[Dict]] = None
+    bench_home: Optional[List[Dict]] = None
+    bench_away: Optional[List[Dict]] = None
+    lineups_status: Optional[Literal["none", "probable", "confirmed"]] = None
+    unavailable_home: Optional[List[Dict]] = None
+    unavailable_away: Optional[List[Dict]] = None
+
+
+class BulkLineupsInput(BaseModel):
+    items: List[BulkLineupsItem]
+
+
+@api_router.post("/matches/lineups/bulk")
+async def post_lineups_bulk(body: BulkLineupsInput, admin=Depends(require_admin)):
+    if not body.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if len(body.items) > BULK_LINEUPS_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items (max {BULK_LINEUPS_MAX_ITEMS})")
+
+    # Validate the whole batch up front so a bad item never leaves a half-applied push
+    now = datetime.now(timezone.utc)
+    errors = []
+    seen = set()
+    ops = []
+    oids = []
+    for idx, item in enumerate(body.items):
+        try:
+            oid = ObjectId(item.match_id)
+        except Exception:
+            errors.append({"index": idx, "match_id": item.match_id, "error": "Invalid match id"})
+            continue
+        if oid in seen:
+            errors.append({"index": idx, "match_id": item.match_id, "error": "Duplicate match id"})
+            continue
+        seen.add(oid)
+        fields = item.dict(exclude_unset=True)
+        updates = {k: fields[k] for k in LINEUPS_FIELDS + INJURIES_FIELDS if k in fields}
+        if not updates:
+            errors.append({"index": idx, "match_id": item.match_id, "error": "No lineups or injuries fields provided"})
+            continue
+        if any(k in updates for k in LINEUPS_FIELDS):
+            updates["lineups_updated_at"] = now
+        if any(k in updates for k in INJURIES_FIELDS):
+            updates["injuries_updated_at"] = now
+        oids.append(oid)
+        ops.append(UpdateOne({"_id": oid}, {"$set": updates}))
+    if errors:
+        raise HTTPException(status_code=400, detail={"reason": "invalid_items", "errors": errors})
+
+    # One projection-only lookup to report unknown ids, instead of re-reading every document
+    existing = set()
+    async for d in db.matches.find({"_id": {"$in": oids}}, {"_id": 1}):
+        existing.add(d["_id"])
+
+    write_errors: Dict[int, str] = {}
+    try:
+        await db.matches.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            write_errors[err["index"]] = err.get("errmsg", "write_failed")
+
+    await match_written(*[oid for oid in oids if oid in existing])
+    await sync_player_appearances([oid for oid in oids if oid in existing])
+
+    results = []
+    for idx, oid in enumerate(oids):
+        if idx in write_errors:
+            results.append({"match_id": str(oid), "status": "error", "error": write_errors[idx]})
+        elif oid not in existing:
+            results.append({"match_id": str(oid), "status": "not_found"})
+        else:
+            results.append({"match_id": str(oid), "status": "updated"})
+    return {
+        "updated": sum(1 for r in results if r["status"] == "updated"),
+        "notFound": sum(1 for r in results if r["status"] == "not_found"),
+        "errors": len(write_errors),
+        "updatedAt": now.isoformat(),
+        "results": results,
+    }
+
+
+# ---------------------------
+# Teams
+# ---------------------------
+# homeTeamKey/awayTeamKey hold a normalised team name ("Atlético Madrid" ->
+# "atletico-madrid"), indexed with startTime on matches, match_cards and the
+# archive. A team's fixtures are an $or over the two indexes, which Mongo merges
+# in startTime order; head-to-head uses the same indexes with both keys pinned.
+TEAM_MATCHES_MAX_LIMIT = 100
+TEAM_LIVE_GRACE_HOURS = float(os.environ.get("TEAM_LIVE_GRACE_HOURS", "3"))
+
+
+def team_key(team) -> Optional[str]:
+    return "-".join(search_tokens(_team_name(team) or "")) or None
+
+
+def team_keys(m: Dict) -> Dict:
+    return {"homeTeamKey": team_key(m.get("homeTeam")), "awayTeamKey": team_key(m.get("awayTeam"))}
+
+
+def normalize_channels(channels: Optional[Dict]) -> Dict[str, List[str]]:
+    # Country keys upper-cased, merging lists stored under "ch" and "CH"
+    out: Dict[str, List[str]] = {}
+    for c, chans in (channels or {}).items():
+        merged = out.setdefault(str(c).upper(), [])
+        merged.extend(ch for ch in chans or [] if ch not in merged)
+    return out
+
+
+def broadcast_countries(m: Dict) -> List[str]:
+    # `channels` is keyed by country, which cannot be indexed; this array can (multikey)
+    return sorted(c for c, chans in normalize_channels(m.get("channels")).items() if chans)
+
+
+def derived_match_fields(m: Dict) -> Dict:
+    # Index-only fields recomputed on every write to a match and its card
+    return {**team_keys(m), "broadcastCountries": broadcast_countries(m)}
+
+
+async def backfill_derived_match_fields():
+    total = 0
+    missing = {"$or": [{"homeTeamKey": {"$exists": False}}, {"broadcastCountries": {"$exists": False}}]}
+    for coll in ("matches", "matches_archive"):
+        ops = []
+        async for m in db[coll].find(missing, {"homeTeam": 1, "awayTeam": 1, "channels": 1}):
+            ops.append(UpdateOne({"_id": m["_id"]}, {"$set": derived_match_fields(m)}))
+            if len(ops) >= CARDS_BACKFILL_BATCH:
+                await db[coll].bulk_write(ops, ordered=False)
+                total += len(ops)
+                ops = []
+        if ops:
+            await db[coll].bulk_write(ops, ordered=False)
+            total += len(ops)
+    if total:
+        logger.info(f"Derived match fields backfilled: {total}")
+
+
+SINGLETON_JOBS.append(("backfill_derived_match_fields", backfill_derived_match_fields, None))
+
+
+async def _team_matches_page(q: Dict, limit: int, descending: bool, tz: Optional[str]):
+    # Past pages also read the archive; both sides share the (startTime, _id) keyset
+    direction = -1 if descending else 1
+    cards = await find_cards(q, [("startTime", direction), ("_id", direction)], limit + 1, descending)
+    has_more = len(cards) > limit
+    cards = cards[:limit]
+    headers: Dict[str, str] = {}
+    if has_more:
+        headers["X-Next-Cursor"] = encode_cursor(cards[-1]["startTime"], cards[-1]["_id"])
+    return [card_out(c, tz) for c in cards], headers
+
+
+def _team_key_or_400(name: str) -> str:
+    key = team_key(name)
+    if not key:
+        raise HTTPException(status_code=400, detail="Invalid team name")
+    return key
+
+
+@api_router.get("/teams/{name}/matches")
+async def team_matches(
+    name: str,
+    request: Request,
+    when: Literal["upcoming", "past"] = Query(default="upcoming"),
+    limit: int = Query(default=20, ge=1, le=TEAM_MATCHES_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    tz: Optional[str] = None,
+):
+    key = _team_key_or_400(name)
+    # "upcoming" keeps matches that kicked off within the grace window (still live)
+    boundary = datetime.now(timezone.utc) - timedelta(hours=TEAM_LIVE_GRACE_HOURS)
+    conds = [{"$or": [{"homeTeamKey": key}, {"awayTeamKey": key}]}]
+    if when == "upcoming":
+        conds += [{"startTime": {"$gte": boundary}}, after_cursor_query(cursor)]
+    else:
+        conds += [{"startTime": {"$lt": boundary}}, before_cursor_query(cursor)]
+    q = {"$and": [c for c in conds if c]}
+
+    async def build():
+        return await _team_matches_page(q, limit, when == "past", tz)
+
+    payload = await cached_payload(f"{FEED_KEY}team:{key}:{when}:{limit}:{cursor}:{tz}", build)
+    return payload.response(request)
+
+
+@api_router.get("/teams/{name}/head-to-head/{other}")
+async def team_head_to_head(name: str, other: str, request: Request, limit: int = Query(default=20, ge=1, le=TEAM_MATCHES_MAX_LIMIT), cursor: Optional[str] = None, tz: Optional[str] = None):
+    a, b = _team_key_or_400(name), _team_key_or_400(other)
+    conds = [{"$or": [{"homeTeamKey": a, "awayTeamKey": b}, {"homeTeamKey": b, "awayTeamKey": a}]}, before_cursor_query(cursor)]
+    q = {"$and": [c for c in conds if c]}
+
+    async def build():
+        return await _team_matches_page(q, limit, True, tz)
+
+    payload = await cached_payload(f"{FEED_KEY}h2h:{min(a, b)}:{max(a, b)}:{limit}:{cursor}:{tz}", build)
+    return payload.response(request)
+
+
+# ---------------------------
+# Calendar feeds
+# ---------------------------
+# iCalendar subscriptions for a competition or a team, rendered from match_cards.
+# The body is cached like the other feeds (evicted on match writes) and carries an
+# ETag over the rendered body, so a calendar app polling every 15 minutes gets a 304
+# without touching Mongo. No Last-Modified: the newest event's stamp does not move
+# when an event is deleted, archived or moved to another competition. Archived matches drop out of
+# the feed on purpose: a subscription covers the last ARCHIVE_AFTER_DAYS and ahead.
+ICS_CACHE_SECONDS = float(os.environ.get("ICS_CACHE_SECONDS", "900"))
+ICS_STREAM_CHUNK = 16 * 1024
+ICS_MAX_EVENTS = 2000
+ICS_PRODID = "-//MVP Sports//Fixtures//EN"
+
+
+def ics_escape(text) -> str:
+    return str(text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def ics_line(line: str) -> str:
+    # RFC 5545 folding: lines longer than 75 octets continue with CRLF + space
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line + "\r\n"
+    parts = []
+    while raw:
+        cut = min(len(raw), 75 if not parts else 74)
+        # Never split inside a UTF-8 sequence
+        while cut < len(raw) and (raw[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(raw[:cut].decode("utf-8"))
+        raw = raw[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ics_time(dt: datetime) -> str:
+    return to_utc(dt).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_ics(name: str, cards: List[Dict]) -> bytes:
+    out = [ics_line(x) for x in ("BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{ICS_PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH", f"X-WR-CALNAME:{ics_escape(name)}")]
+    for c in cards:
+        home, away = _team_name(c.get("homeTeam")) or "TBD", _team_name(c.get("awayTeam")) or "TBD"
+        stamp = c.get("cardUpdatedAt") or c["startTime"]
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{c['_id']}@mvp-sports",
+            f"DTSTAMP:{ics_time(stamp)}",
+            f"LAST-MODIFIED:{ics_time(stamp)}",
+            f"DTSTART:{ics_time(c['startTime'])}",
+            f"DTEND:{ics_time(c.get('finalAt') or c['startTime'] + timedelta(hours=2))}",
+            f"SUMMARY:{ics_escape(f'{home} vs {away}')}",
+        ]
+        venue = c.get("venue") or c.get("stadium")
+        if venue:
+            lines.append(f"LOCATION:{ics_escape(venue.get('name') if isinstance(venue, dict) else venue)}")
+        if c.get("tournament"):
+            lines.append(f"DESCRIPTION:{ics_escape(c['tournament'])}")
+        lines.append("END:VEVENT")
+        out.extend(ics_line(x) for x in lines)
+    out.append(ics_line("END:VCALENDAR"))
+    return "".join(out).encode("utf-8")
+
+
+async def _calendar(request: Request, key: str, name: str, q: Dict, filename: str) -> Response:
+    async def build():
+        cards = await db.match_cards.find(q).sort([("startTime", 1), ("_id", 1)]).limit(ICS_MAX_EVENTS).to_list(ICS_MAX_EVENTS)
+        return render_ics(name, cards), {"Content-Disposition": f'inline; filename="{filename}.ics"'}
+
+    payload = await cached_payload(key, build, ttl=ICS_CACHE_SECONDS, media_type="text/calendar; charset=utf-8")
+    return payload.streaming_response(request, ICS_STREAM_CHUNK)
+
+
+@api_router.get("/competitions/{comp_id}/calendar.ics")
+async def competition_calendar(comp_id: str, request: Request):
+    snap = await get_competitions_snapshot()
+    c = snap["byId"].get(comp_id) or snap["bySlug"].get(comp_id)
+    if not c:
+        if not ObjectId.is_valid(comp_id):
+            raise HTTPException(status_code=400, detail="Invalid competition id")
+        raise HTTPException(status_code=404, detail="Competition not found")
+    # (competition_id, startTime, _id) index, same as /competitions/{id}/matches
+    q = {"competition_id": ObjectId(c["_id"])}
+    return await _calendar(request, f"{FEED_KEY}ics:competition:{c['_id']}", c.get("name") or "Fixtures", q, c.get("slug") or c["_id"])
+
+
+@api_router.get("/teams/{name}/calendar.ics")
+async def team_calendar(name: str, request: Request):
+    key = _team_key_or_400(name)
+    q = {"$or": [{"homeTeamKey": key}, {"awayTeamKey": key}]}
+    return await _calendar(request, f"{FEED_KEY}ics:team:{key}", name, q, key)
+
+
+# ---------------------------
+# Startup bundle
+# ---------------------------
+# Everything the app needs to paint a cold start in one conditional request: the
+# competitions list plus this week's grouped match cards. Feed and competition
+# invalidations rebuild it in the background; requests keep getting the previous
+# bundle (and ETag) until the new one is swapped in. It is also rebuilt once it is
+# older than BUNDLE_MAX_AGE_SECONDS so the week window rolls forward.
+BUNDLE_SCHEMA = 1
+BUNDLE_MAX_AGE_SECONDS = float(os.environ.get("BUNDLE_MAX_AGE_SECONDS", "300"))
+# Coalesces a burst of match writes into one rebuild
+BUNDLE_REBUILD_DELAY_SECONDS = float(os.environ.get("BUNDLE_REBUILD_DELAY_SECONDS", "1"))
+
+_bundle: Dict = {"payload": None, "builtAt": 0.0, "dirty": False, "task": None, "rebuilds": 0}
+
+
+async def _rebuild_bundle() -> CachedPayload:
+    snap = await get_competitions_snapshot()
+    grouped = await _build_grouped(None, None)
+    for cards in grouped.values():
+        for c in cards:
+            # Per-request clock; the bundle's freshness is its Last-Modified instead
+            c.pop("now", None)
+    raw = json_bytes({"schema": BUNDLE_SCHEMA, "competitions": snap["items"], "matches": grouped})
+    old = _bundle["payload"]
+    # Unchanged content keeps its ETag, Last-Modified and compressed bodies
+    if old is None or old.raw != raw:
+        last_modified = format_datetime(datetime.now(timezone.utc), usegmt=True)
+        _bundle["payload"] = CachedPayload(raw, headers={"Last-Modified": last_modified})
+    _bundle["builtAt"] = time.monotonic()
+    _bundle["rebuilds"] += 1
+    return _bundle["payload"]
+
+
+async def _refresh_bundle():
+    while _bundle["dirty"]:
+        await asyncio.sleep(BUNDLE_REBUILD_DELAY_SECONDS)
+        _bundle["dirty"] = False
+        try:
+            await single_flight.do("bundle", _rebuild_bundle)
+        except Exception as e:
+            logger.warning(f"Bundle rebuild failed: {e}")
+
+
+def _schedule_bundle_refresh():
+    _bundle["dirty"] = True
+    task = _bundle["task"]
+    if task is None or task.done():
+        try:
+            _bundle["task"] = asyncio.get_running_loop().create_task(_refresh_bundle())
+        except RuntimeError:
+            pass
+
+
+def _on_bundle_invalidation(keys: List[str]):
+    # Nothing built yet on this worker: the first request builds it
+    if _bundle["payload"] is None:
+        return
+    if any(k == COMPETITIONS_KEY or k.startswith(FEED_KEY) or FEED_KEY.startswith(k) for k in keys):
+        _schedule_bundle_refresh()
+
+
+INVALIDATION_HANDLERS.append(_on_bundle_invalidation)
+METRICS_PROVIDERS["bundle"] = lambda: {
+    "etag": _bundle["payload"].etag if _bundle["payload"] else None,
+    "bytes": len(_bundle["payload"].raw) if _bundle["payload"] else 0,
+    "ageSeconds": round(time.monotonic() - _bundle["builtAt"], 1) if _bundle["payload"] else None,
+    "rebuilds": _bundle["rebuilds"],
+}
+
+
+@api_router.get("/bundle")
+async def startup_bundle(request: Request):
+    payload = _bundle["payload"]
+    if payload is None:
+        payload = await single_flight.do("bundle", _rebuild_bundle)
+    elif time.monotonic() - _bundle["builtAt"] > BUNDLE_MAX_AGE_SECONDS:
+        _schedule_bundle_refresh()
+    return payload.response(request)
+
+
+# ---------------------------
+# Players
+# ---------------------------
+# Players with a playerId in lineup_*/bench_* are normalised into `players`, and
+# each (player, match) pair becomes a `player_appearances` row keyed by
+# (playerId, startTime), so a profile is one indexed range scan instead of a scan
+# over embedded arrays. Call sync_player_appearances after writing lineups.
+# Appearances outlive archiving; match rows come from cards or the archive.
+LINEUP_SIDES = [("lineup_home", "home"), ("lineup_away", "away"), ("bench_home", "home"), ("bench_away", "away")]
+APPEARANCE_MATCH_PROJECTION = {"startTime": 1, "competition_id": 1, "sport": 1, **{field: 1 for field, _ in LINEUP_SIDES}}
+PLAYER_MATCHES_MAX_LIMIT = 200
+
+
+def _match_appearances(m: Dict) -> Dict[str, Dict]:
+    out: Dict[str, Dict] = {}
+    for field, side in LINEUP_SIDES:
+        for p in m.get(field) or []:
+            pid = p.get("playerId") if isinstance(p, dict) else None
+            if not pid or pid in out:
+                continue
+            out[pid] = {
+                "_id": f"{pid}:{m['_id']}",
+                "playerId": pid,
+                "matchId": m["_id"],
+                "startTime": m.get("startTime"),
+                "competition_id": m.get("competition_id"),
+                "sport": m.get("sport"),
+                "side": side,
+                "role": p.get("role"),
+                "number": p.get("number"),
+                "pos": p.get("pos"),
+                "name": p.get("name"),
+                "nationalityCode": p.get("nationalityCode"),
+            }
+    return out
+
+
+async def sync_player_appearances(oids: List[ObjectId], source: str = "matches"):
+    if not oids:
+        return
+    now = datetime.now(timezone.utc)
+    player_ops = []
+    appearance_ops = []
+    async for m in db[source].find({"_id": {"$in": list(oids)}}, APPEARANCE_MATCH_PROJECTION):
+        apps = _match_appearances(m)
+        appearance_ops.append(DeleteMany({"matchId": m["_id"], "playerId": {"$nin": list(apps)}}))
+        for pid, a in apps.items():
+            appearance_ops.append(ReplaceOne({"_id": a["_id"]}, a, upsert=True))
+            player_ops.append(UpdateOne(
+                {"_id": pid},
+                {"$set": {"name": a["name"], "pos": a["pos"], "nationalityCode": a["nationalityCode"], "sport": a["sport"], "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+                upsert=True,
+            ))
+    if player_ops:
+        await db.players.bulk_write(player_ops, ordered=False)
+    if appearance_ops:
+        await db.player_appearances.bulk_write(appearance_ops, ordered=False)
+
+
+async def backfill_player_appearances():
+    total = 0
+    for source in ("matches", "matches_archive"):
+        batch = []
+        async for m in db[source].find({"$or": [{field: {"$exists": True}} for field, _ in LINEUP_SIDES]}, {"_id": 1}):
+            batch.append(m["_id"])
+            if len(batch) >= CARDS_BACKFILL_BATCH:
+                await sync_player_appearances(batch, source)
+                total += len(batch)
+                batch = []
+        await sync_player_appearances(batch, source)
+        total += len(batch)
+    logger.info(f"Player appearances backfilled from {total} matches")
+
+
+SINGLETON_JOBS.append(("backfill_player_appearances", backfill_player_appearances, None))
+
+
+async def _get_player(player_id: str) -> Dict:
+    p = await db.players.find_one({"_id": player_id})
+    if not p:
+        raise HTTPException(status_code=404, detail="Player not found")
+    return sanitize({"id": p.pop("_id"), **p})
+
+
+async def _player_appearances(player_id: str, limit: int, before: Optional[datetime]) -> List[Dict]:
+    q: Dict = {"playerId": player_id}
+    if before is not None:
+        q["startTime"] = {"$lt": to_utc(before)}
+    # (playerId, startTime) index, most recent first
+    return await db.player_appearances.find(q).sort("startTime", -1).limit(limit).to_list(limit)
+
+
+@api_router.get("/players/{player_id}/matches")
+async def player_matches(player_id: str, tz: Optional[str] = None, limit: int = Query(default=50, ge=1, le=PLAYER_MATCHES_MAX_LIMIT), before: Optional[datetime] = None):
+    player = await _get_player(player_id)
+    apps = await _player_appearances(player_id, limit, before)
+    ids = [a["matchId"] for a in apps]
+    cards = {c["_id"]: c async for c in db.match_cards.find({"_id": {"$in": ids}})}
+    missing = [oid for oid in ids if oid not in cards]
+    if missing:
+        async for m in db.matches_archive.find({"_id": {"$in": missing}}):
+            cards[m["_id"]] = archived_card(m)
+    matches = []
+    for a in apps:
+        card = cards.get(a["matchId"])
+        if card is None:
+            continue
+        matches.append({**card_out(card, tz), "appearance": {k: a.get(k) for k in ("side", "role", "number", "pos")}})
+    next_before = apps[-1]["startTime"].isoformat() if len(apps) == limit and apps[-1].get("startTime") else None
+    return {"player": player, "matches": matches, "nextBefore": next_before}
+
+
+@api_router.get("/players/{player_id}/ratings")
+async def player_ratings_history(player_id: str, limit: int = Query(default=50, ge=1, le=PLAYER_MATCHES_MAX_LIMIT), before: Optional[datetime] = None):
+    player = await _get_player(player_id)
+    apps = await _player_appearances(player_id, limit, before)
+    # player_ratings are keyed by the display name; join on (matchId, player) per appearance
+    pairs = [{"matchId": a["matchId"], "player": a.get("name") or player.get("name")} for a in apps]
+    per_match: Dict[ObjectId, Dict] = {}
+    if pairs:
+        pipeline = [
+            {"$match": {"$or": pairs}},
+            {"$group": {"_id": "$matchId", "count": {"$sum": 1}, **{k: {"$avg": f"${k}"} for k in PLAYER_RATING_ATTRS}}},
+        ]
+        for coll in ("player_ratings", "player_ratings_archive"):
+            async for d in db[coll].aggregate(pipeline):
+                prev = per_match.get(d["_id"])
+                if prev:
+                    n = prev["count"] + d["count"]
+                    d = {"_id": d["_id"], "count": n, **{k: (prev[k] * prev["count"] + d[k] * d["count"]) / n for k in PLAYER_RATING_ATTRS}}
+                per_match[d["_id"]] = d
+    rows = []
+    totals = {k: 0.0 for k in PLAYER_RATING_ATTRS}
+    count = 0
+    for a in apps:
+        d = per_match.get(a["matchId"])
+        if not d:
+            continue
+        averages = {k: round(d[k] or 0, 2) for k in PLAYER_RATING_ATTRS}
+        rows.append({"matchId": str(a["matchId"]), "startTime": sanitize(a.get("startTime")), "count": d["count"], "averages": averages, "overall": round(sum(averages.values()) / len(averages), 2)})
+        for k in PLAYER_RATING_ATTRS:
+            totals[k] += (d[k] or 0) * d["count"]
+        count += d["count"]
+    career = {k: round(v / count, 2) for k, v in totals.items()} if count else {k: 0 for k in PLAYER_RATING_ATTRS}
+    return {
+        "player": player,
+        "count": count,
+        "averages": career,
+        "overall": round(sum(career.values()) / len(career), 2),
+        "matches": rows,
+        "nextBefore": apps[-1]["startTime"].isoformat() if len(apps) == limit and apps[-1].get("startTime") else None,
+    }
+
+
+# ---------------------------
+# Hot/cold split: match archive
+# ---------------------------
+# Matches whose voting window closed more than ARCHIVE_AFTER_DAYS ago move to
+# `matches_archive`, together with their per-match collections, so the hot
+# collections (and their indexes) only hold the current working set. Copies are
+# done server-side with $merge before anything is deleted, so a crash mid-batch
+# is simply redone by the next run.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH = 200
+ARCHIVED_MATCH_COLLECTIONS = ["votes", "ratings", "player_ratings", "vote_ledger"]
+
+
+async def find_match(oid: ObjectId, projection: Optional[Dict] = None) -> Optional[Dict]:
+    # Reads by id transparently fall back to the archive
+    m = await db.matches.find_one({"_id": oid}, projection)
+    if m is None:
+        m = await db.matches_archive.find_one({"_id": oid}, projection)
+    return m
+
+
+def reaches_archive(date_from: Optional[datetime]) -> bool:
+    # Archived matches closed voting, and so kicked off, before this horizon
+    return date_from is None or to_utc(date_from) < datetime.now(timezone.utc) - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def archived_card(m: Dict) -> Dict:
+    card = build_match_card(m)
+    card["cardUpdatedAt"] = m.get("archivedAt") or card["cardUpdatedAt"]
+    return card
+
+
+async def find_cards(q: Dict, sort: List[tuple], limit: int, include_archive: bool) -> List[Dict]:
+    # Card query over the hot cards plus, for windows reaching back past the
+    # archive horizon, cards built from matches_archive (same fields and indexes)
+    cards = await db.match_cards.find(q).sort(sort).limit(limit).to_list(limit)
+    if include_archive:
+        archived = await db.matches_archive.find(q).sort(sort).limit(limit).to_list(limit)
+        cards = sorted(cards + [archived_card(m) for m in archived], key=lambda c: (to_utc(c["startTime"]), c["_id"]), reverse=sort[0][1] < 0)[:limit]
+    return cards
+
+
+async def _merge_into(source: str, match_filter: Dict, target: str):
+    pipeline = [{"$match": match_filter}, {"$merge": {"into": target, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}]
+    async for _ in db[source].aggregate(pipeline):
+        pass
+
+
+async def archive_finished_matches() -> Dict:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    totals = {"matches": 0, **{coll: 0 for coll in ARCHIVED_MATCH_COLLECTIONS}}
+    while True:
+        batch = await db.matches.find({"voting_close_at": {"$lt": cutoff}, "scoresSettledAt": {"$exists": True}}, {"_id": 1}).limit(ARCHIVE_BATCH).to_list(ARCHIVE_BATCH)
+        if not batch:
+            break
+        ids = [d["_id"] for d in batch]
+        await _merge_into("matches", {"_id": {"$in": ids}}, "matches_archive")
+        for coll in ARCHIVED_MATCH_COLLECTIONS:
+            await _merge_into(coll, {"matchId": {"$in": ids}}, f"{coll}_archive")
+        for coll in ARCHIVED_MATCH_COLLECTIONS:
+            res = await db[coll].delete_many({"matchId": {"$in": ids}})
+            totals[coll] += res.deleted_count
+        res = await db.matches.delete_many({"_id": {"$in": ids}})
+        totals["matches"] += res.deleted_count
+        await db.matches_archive.update_many({"_id": {"$in": ids}}, {"$set": {"archivedAt": datetime.now(timezone.utc)}})
+        # Drops the cards (the matches are gone from the hot collection)
+        await match_written(*ids)
+    if totals["matches"]:
+        logger.info(f"Archived matches: {totals}")
+    return totals
+
+
+SINGLETON_JOBS.append(("archive_finished_matches", archive_finished_matches, ARCHIVE_INTERVAL_SECONDS))
+
+
+@api_router.post("/admin/archive/run")
+async def run_archive(admin=Depends(require_admin)):
+    return {"ok": True, "afterDays": ARCHIVE_AFTER_DAYS, "archived": await archive_finished_matches()}
+
+
+# ---------------------------
+# Match lifecycle scheduler
+# ---------------------------
+# Flips `status` and the persisted `voting_state` when the precomputed
+# startTime/finalAt/voting_open_at/voting_close_at boundaries pass. Each
+# transition is one indexed query plus an update_many over the matching ids.
+LIFECYCLE_INTERVAL_SECONDS = int(os.environ.get("LIFECYCLE_INTERVAL_SECONDS", "15"))
+
+
+def _lifecycle_transitions(now: datetime) -> List[tuple]:
+    return [
+        ({"status": "scheduled", "startTime": {"$lte": now}, "finalAt": {"$gt": now}}, {"status": "live"}),
+        ({"status": {"$in": ["scheduled", "live"]}, "finalAt": {"$lte": now}}, {"status": "finished"}),
+        ({"voting_state": {"$exists": False}, "voting_open_at": {"$gt": now}}, {"voting_state": "pending"}),
+        ({"voting_state": {"$in": ["pending", None]}, "voting_open_at": {"$lte": now}, "voting_close_at": {"$gt": now}}, {"voting_state": "open"}),
+        ({"voting_state": {"$in": ["pending", "open", None]}, "voting_close_at": {"$lte": now}}, {"voting_state": "closed"}),
+    ]
+
+
+async def advance_match_lifecycle() -> Dict:
+    now = datetime.now(timezone.utc)
+    changed = set()
+    counts = {}
+    for cond, fields in _lifecycle_transitions(now):
+        ids = [d["_id"] async for d in db.matches.find(cond, {"_id": 1})]
+        if not ids:
+            continue
+        res = await db.matches.update_many({"_id": {"$in": ids}, **cond}, {"$set": {**fields, "lifecycleUpdatedAt": now}})
+        counts["/".join(f"{k}={v}" for k, v in fields.items())] = res.modified_count
+        changed.update(ids)
+    if changed:
+        await match_written(*changed)
+        logger.info(f"Match lifecycle transitions: {counts}")
+    return counts
+
+
+SINGLETON_JOBS.append(("advance_match_lifecycle", advance_match_lifecycle, LIFECYCLE_INTERVAL_SECONDS))
+
+
+# ---------------------------
+# Score settlement
+# ---------------------------
+# Votes only touch the ledger and tallies; scores are settled once per match after
+# voting_close_at, against the final tally. One pipeline over vote_ledger (plus
+# player_ratings via $unionWith) computes every participant's delta with window
+# functions and $merges it into score_settlements; the deltas are then applied to
+# users in chunked bulk writes. Scoring rules match the old per-vote ones:
+#   category vote: +1 within 20 points of the leader, else -1
+#   like/dislike: +1 when on the majority side (likes win ties), else -1
+#   player rating: per attribute +1 within 2 of the average, -1 beyond 3
+# Votes and ratings written before settlement existed were scored on submit. The
+# first worker start pins a cutover: matches closed before it are marked settled
+# without scoring, and rows last written before it still count towards the tallies
+# but earn nothing.
+SETTLEMENT_CUTOVER_ID = "settlementCutover"
+SETTLEMENT_INTERVAL_SECONDS = int(os.environ.get("SETTLEMENT_INTERVAL_SECONDS", "30"))
+SETTLEMENT_MATCH_BATCH = int(os.environ.get("SETTLEMENT_MATCH_BATCH", "50"))
+SETTLEMENT_BULK_CHUNK = int(os.environ.get("SETTLEMENT_BULK_CHUNK", "1000"))
+
+
+def _pct(count, total) -> Dict:
+    return {"$round": [{"$divide": [{"$multiply": [count, 100]}, total]}, 1]}
+
+
+_settlement_cutover: Dict = {"at": None}
+
+
+async def settlement_cutover() -> datetime:
+    if _settlement_cutover["at"] is None:
+        now = datetime.now(timezone.utc)
+        doc = await db.meta.find_one_and_update({"_id": SETTLEMENT_CUTOVER_ID}, {"$setOnInsert": {"at": now}}, upsert=True, return_document=ReturnDocument.AFTER)
+        _settlement_cutover["at"] = to_utc(doc["at"])
+    return _settlement_cutover["at"]
+
+
+async def mark_presettled_matches(cutover: datetime) -> int:
+    # (scoresSettledAt, voting_close_at) index; a no-op once the history is marked
+    res = await db.matches.update_many(
+        {"scoresSettledAt": {"$exists": False}, "voting_close_at": {"$lt": cutover}},
+        {"$set": {"scoresSettledAt": cutover, "scoresSettledBeforeCutover": True}},
+    )
+    if res.modified_count:
+        logger.info(f"Marked {res.modified_count} matches closed before the settlement cutover as settled")
+    return res.modified_count
+
+
+def _settlement_pipeline(ids: List[ObjectId], cutover: datetime) -> List[Dict]:
+    likes = {"$cond": [{"$eq": ["$player", "like"]}, "$choiceCount", {"$subtract": ["$total", "$choiceCount"]}]}
+    vote_delta = {
+        "$cond": [
+            {"$eq": ["$category", RATING_LEDGER_CATEGORY]},
+            {"$cond": [{"$eq": [{"$eq": ["$player", "like"]}, {"$gte": [_pct(likes, "$total"), 50]}]}, 1, -1]},
+            {"$cond": [{"$gte": [_pct("$choiceCount", "$total"), {"$subtract": [_pct("$topCount", "$total"), 20]}]}, 1, -1]},
+        ]
+    }
+    player_rating_delta = {"$add": [
+        {"$switch": {
+            "branches": [
+                {"case": {"$lte": [{"$abs": {"$subtract": [{"$ifNull": [f"${k}", 0]}, f"$avg_{k}"]}}, 2]}, "then": 1},
+                {"case": {"$gt": [{"$abs": {"$subtract": [{"$ifNull": [f"${k}", 0]}, f"$avg_{k}"]}}, 3]}, "then": -1},
+            ],
+            "default": 0,
+        }}
+        for k in PLAYER_RATING_ATTRS
+    ]}
+    return [
+        {"$match": {"matchId": {"$in": ids}}},
+        {"$setWindowFields": {"partitionBy": {"m": "$matchId", "c": "$category", "p": "$player"}, "output": {"choiceCount": {"$count": {}}}}},
+        {"$setWindowFields": {"partitionBy": {"m": "$matchId", "c": "$category"}, "output": {"total": {"$count": {}}, "topCount": {"$max": "$choiceCount"}}}},
+        {"$match": {"updatedAt": {"$gte": cutover}}},
+        {"$project": {"_id": 0, "matchId": 1, "userId": 1, "delta": vote_delta}},
+        {"$unionWith": {"coll": "player_ratings", "pipeline": [
+            {"$match": {"matchId": {"$in": ids}, "token": {"$type": "objectId"}}},
+            {"$setWindowFields": {"partitionBy": {"m": "$matchId", "p": "$player"}, "output": {f"avg_{k}": {"$avg": {"$ifNull": [f"${k}", 0]}} for k in PLAYER_RATING_ATTRS}}},
+            {"$match": {"updatedAt": {"$gte": cutover}}},
+            {"$project": {"_id": 0, "matchId": 1, "userId": "$token", "delta": player_rating_delta}},
+        ]}},
+        {"$group": {"_id": {"matchId": "$matchId", "userId": "$userId"}, "delta": {"$sum": "$delta"}}},
+        {"$match": {"delta": {"$ne": 0}}},
+        {"$project": {"matchId": "$_id.matchId", "userId": "$_id.userId", "delta": 1, "applied": {"$literal": False}, "settledAt": "$$NOW"}},
+        # keepExisting: a rerun never resets rows that were already applied
+        {"$merge": {"into": "score_settlements", "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}},
+    ]
+
+
+async def _apply_settlements(ids: List[ObjectId]) -> int:
+    applied = 0
+    while True:
+        chunk = await db.score_settlements.find({"matchId": {"$in": ids}, "applied": False}, {"matchId": 1, "userId": 1, "delta": 1}).limit(SETTLEMENT_BULK_CHUNK).to_list(SETTLEMENT_BULK_CHUNK)
+        if not chunk:
+            return applied
+        # Events already logged by an interrupted run are not applied twice
+        await apply_score_events([score_event(s["userId"], s["delta"], "settlement", str(s["matchId"])) for s in chunk])
+        await db.score_settlements.update_many({"_id": {"$in": [s["_id"] for s in chunk]}}, {"$set": {"applied": True, "appliedAt": datetime.now(timezone.utc)}})
+        applied += len(chunk)
+
+
+async def settle_match_scores() -> Dict:
+    cutover = await settlement_cutover()
+    await mark_presettled_matches(cutover)
+    totals = {"matches": 0, "settlements": 0}
+    while True:
+        now = datetime.now(timezone.utc)
+        batch = await db.matches.find({"scoresSettledAt": {"$exists": False}, "voting_close_at": {"$lte": now}}, {"_id": 1}).limit(SETTLEMENT_MATCH_BATCH).to_list(SETTLEMENT_MATCH_BATCH)
+        if not batch:
+            break
+        ids = [d["_id"] for d in batch]
+        await db.vote_ledger.aggregate(_settlement_pipeline(ids, cutover)).to_list(None)
+        totals["settlements"] += await _apply_settlements(ids)
+        await db.matches.update_many({"_id": {"$in": ids}}, {"$set": {"scoresSettledAt": now}})
+        totals["matches"] += len(ids)
+    if totals["matches"]:
+        logger.info(f"Settled match scores: {totals}")
+    return totals
+
+
+SINGLETON_JOBS.append(("settle_match_scores", settle_match_scores, SETTLEMENT_INTERVAL_SECONDS))
+
+
+@api_router.post("/admin/settlement/run")
+async def run_settlement(admin=Depends(require_admin)):
+    return {"ok": True, "settled": await settle_match_scores()}
+
+
+# ---------------------------
+# Score reconciliation
+# ---------------------------
+# score_events is the source of truth for users.score. Scores that predate the log
+# get one "baseline" event each (score minus whatever events already exist), after
+# which the reconciler can rebuild any score from its events. It splits the users
+# into _id ranges with $bucketAuto and walks them on a small pool in short keyset
+# chunks, pausing between chunks so it can run against the live database. Fixes
+# are compare-and-set on the score that was read: a user scored mid-run is left
+# for the next pass instead of being overwritten. Baselines are compare-and-set
+# too, in the same transaction as their event (logged first and taken back on a
+# miss where there are no transactions), so a settlement landing between reading
+# the score and reading the events cannot be counted twice.
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get("RECONCILE_INTERVAL_SECONDS", str(6 * 3600)))
+RECONCILE_PARTITIONS = int(os.environ.get("RECONCILE_PARTITIONS", "16"))
+RECONCILE_CONCURRENCY = int(os.environ.get("RECONCILE_CONCURRENCY", "4"))
+RECONCILE_CHUNK = int(os.environ.get("RECONCILE_CHUNK", "500"))
+RECONCILE_PAUSE_MS = int(os.environ.get("RECONCILE_PAUSE_MS", "20"))
+
+
+async def _event_totals(user_ids: List[ObjectId]) -> Dict[ObjectId, int]:
+    cur = db.score_events.aggregate([
+        {"$match": {"userId": {"$in": user_ids}}},
+        {"$group": {"_id": "$userId", "total": {"$sum": "$delta"}}},
+    ])
+    return {d["_id"]: d["total"] async for d in cur}
+
+
+async def _baseline_user(user: Dict, total: int) -> bool:
+    score = user.get("score", 0)
+    event = score_event(user["_id"], score - total, "baseline", "initial")
+
+    async def mark(session) -> bool:
+        res = await db.users.update_one(
+            {"_id": user["_id"], "score": score, "scoreBaselineAt": {"$exists": False}},
+            {"$set": {"scoreBaselineAt": event["ts"]}},
+            session=session,
+        )
+        return bool(res.matched_count)
+
+    async def log(delta: int, session):
+        # $inc onto a baseline an older run logged without marking the user
+        await db.score_events.update_one(
+            {"_id": event["_id"]},
+            {"$inc": {"delta": delta}, "$setOnInsert": {k: v for k, v in event.items() if k not in ("_id", "delta")}},
+            upsert=True,
+            session=session,
+        )
+
+    async def txn(session):
+        if not await mark(session):
+            # Scored since it was read: left for the next pass
+            return False
+        await log(event["delta"], session)
+        return True
+
+    if mongo_features["transactions"]:
+        return await run_in_transaction(txn)
+    # Standalone: log first, so a crash before the mark leaves an unmarked user
+    # whose next pass $incs the logged baseline to the right total; a user scored
+    # since it was read gets the baseline taken back
+    await log(event["delta"], None)
+    if await mark(None):
+        return True
+    await log(-event["delta"], None)
+    return False
+
+
+async def baseline_score_events() -> int:
+    created = 0
+    after = None
+    while True:
+        q: Dict = {"scoreBaselineAt": {"$exists": False}}
+        if after is not None:
+            q["_id"] = {"$gt": after}
+        users = await db.users.find(q, {"score": 1}).sort("_id", 1).limit(RECONCILE_CHUNK).to_list(RECONCILE_CHUNK)
+        if not users:
+            break
+        after = users[-1]["_id"]
+        totals = await _event_totals([u["_id"] for u in users])
+        for u in users:
+            created += await _baseline_user(u, totals.get(u["_id"], 0))
+    if created:
+        logger.info(f"Baselined score events for {created} users")
+    return created
+
+
+SINGLETON_JOBS.append(("baseline_score_events", baseline_score_events, None))
+
+
+async def _user_id_ranges() -> List[tuple]:
+    buckets = await db.users.aggregate([
+        {"$match": {"scoreBaselineAt": {"$exists": True}}},
+        {"$bucketAuto": {"groupBy": "$_id", "buckets": RECONCILE_PARTITIONS}},
+    ]).to_list(None)
+    # $bucketAuto bounds are [min, max) except for the last bucket, which includes max
+    return [(b["_id"]["min"], b["_id"]["max"], i == len(buckets) - 1) for i, b in enumerate(buckets)]
+
+
+async def _reconcile_range(lo: ObjectId, hi: ObjectId, inclusive: bool, stats: Dict):
+    after = None
+    while True:
+        cond = {"$gte": lo, "$lte" if inclusive else "$lt": hi}
+        if after is not None:
+            cond["$gt"] = after
+        users = await db.users.find({"_id": cond, "scoreBaselineAt": {"$exists": True}}, {"score": 1}).sort("_id", 1).limit(RECONCILE_CHUNK).to_list(RECONCILE_CHUNK)
+        if not users:
+            return
+        after = users[-1]["_id"]
+        totals = await _event_totals([u["_id"] for u in users])
+        ops = [
+            UpdateOne({"_id": u["_id"], "score": u.get("score", 0)}, {"$set": {"score": totals.get(u["_id"], 0)}})
+            for u in users
+            if u.get("score", 0) != totals.get(u["_id"], 0)
+        ]
+        stats["checked"] += len(users)
+        if ops:
+            res = await db.users.bulk_write(ops, ordered=False)
+            stats["fixed"] += res.modified_count
+            stats["skipped"] += len(ops) - res.matched_count
+        await asyncio.sleep(RECONCILE_PAUSE_MS / 1000)
+
+
+async def reconcile_user_scores() -> Dict:
+    await baseline_score_events()
+    stats = {"partitions": 0, "checked": 0, "fixed": 0, "skipped": 0}
+    ranges = await _user_id_ranges()
+    stats["partitions"] = len(ranges)
+    sem = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+    async def run(lo, hi, inclusive):
+        async with sem:
+            await _reconcile_range(lo, hi, inclusive, stats)
+
+    await asyncio.gather(*(run(*r) for r in ranges))
+    if stats["fixed"] or stats["skipped"]:
+        logger.info(f"Reconciled user scores: {stats}")
+    return stats
+
+
+SINGLETON_JOBS.append(("reconcile_user_scores", reconcile_user_scores, RECONCILE_INTERVAL_SECONDS))
+
+
+@api_router.post("/admin/scores/reconcile")
+async def run_reconcile(admin=Depends(require_admin)):
+    return {"ok": True, "reconciled": await reconcile_user_scores()}
+
+
+# ---------------------------
+# Data export
+# ---------------------------
+# Streams a dataset for the matches of a competition and/or kickoff range, hot and
+# archived, as NDJSON or CSV. Rows are read through batched cursors and flushed
+# every EXPORT_BATCH rows; StreamingResponse awaits each send, so a slow client
+# holds the cursor back instead of the worker buffering the export.
+EXPORT_BATCH = int(os.environ.get("EXPORT_BATCH", "1000"))
+EXPORT_MATCH_CHUNK = int(os.environ.get("EXPORT_MATCH_CHUNK", "500"))
+
+
+def _vote_rows(doc: Dict) -> List[Dict]:
+    return [
+        {"matchId": doc["matchId"], "category": cat, "player": player, "votes": n}
+        for cat, counter in (doc.get("votes") or {}).items()
+        for player, n in counter.items()
+    ]
+
+
+def _rating_rows(doc: Dict) -> List[Dict]:
+    return [{"matchId": doc["matchId"], "likes": doc.get("likes", 0), "dislikes": doc.get("dislikes", 0)}]
+
+
+def _player_rating_rows(doc: Dict) -> List[Dict]:
+    row = {"matchId": doc["matchId"], "userId": doc.get("token"), "player": doc.get("player")}
+    row.update({k: doc.get(k, 0) for k in PLAYER_RATING_ATTRS})
+    row["updatedAt"] = doc.get("updatedAt")
+    return [row]
+
+
+EXPORT_DATASETS = {
+    "votes": (["matchId", "category", "player", "votes"], _vote_rows),
+    "ratings": (["matchId", "likes", "dislikes"], _rating_rows),
+    "player_ratings": (["matchId", "userId", "player", *PLAYER_RATING_ATTRS, "updatedAt"], _player_rating_rows),
+}
+
+
+async def _export_match_id_chunks(q: Dict):
+    for coll in ("matches", "matches_archive"):
+        ids = []
+        async for m in db[coll].find(q, {"_id": 1}).batch_size(EXPORT_MATCH_CHUNK):
+            ids.append(m["_id"])
+            if len(ids) >= EXPORT_MATCH_CHUNK:
+                yield ids
+                ids = []
+        if ids:
+            yield ids
+
+
+async def _export_stream(dataset: str, fmt: str, q: Dict):
+    columns, to_rows = EXPORT_DATASETS[dataset]
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    pending = 0
+    async for ids in _export_match_id_chunks(q):
+        for coll in (dataset, f"{dataset}_archive"):
+            async for doc in db[coll].find({"matchId": {"$in": ids}}).batch_size(EXPORT_BATCH):
+                for row in to_rows(doc):
+                    row = sanitize(row)
+                    if writer:
+                        writer.writerow([row.get(c) for c in columns])
+                    else:
+                        buf.write(json.dumps(row, separators=(",", ":")) + "\n")
+                    pending += 1
+                if pending >= EXPORT_BATCH:
+                    yield buf.getvalue().encode("utf-8")
+                    buf.seek(0)
+                    buf.truncate()
+                    pending = 0
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+@api_router.get("/admin/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    fmt: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    competition_id: Optional[str] = Query(default=None),
+    date_from: Optional[datetime] = Query(default=None, alias="from"),
+    date_to: Optional[datetime] = Query(default=None, alias="to"),
+    admin=Depends(require_admin),
+):
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset '{dataset}'")
+    q: Dict = {}
+    if competition_id:
+        if not ObjectId.is_valid(competition_id):
+            raise HTTPException(status_code=400, detail="Invalid competition id")
+        q["competition_id"] = ObjectId(competition_id)
+    window: Dict = {}
+    if date_from is not None:
+        window["$gte"] = to_utc(date_from)
+    if date_to is not None:
+        window["$lt"] = to_utc(date_to)
+    if window:
+        q["startTime"] = window
+    if not q:
+        raise HTTPException(status_code=400, detail="competition_id or a from/to range is required")
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{dataset}-{competition_id or 'all'}.{fmt}"
+    return StreamingResponse(
+        _export_stream(dataset, fmt, q),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 # ---------------------------
 # TheSportsDB Importer (graceful)
 # ---------------------------
@@ -1036,15 +3911,23 @@ async def import_thesportsdb(days: int = 1):
 
 # Include router and middleware
 app.include_router(api_router)
+# Innermost: shed responses still get CORS headers and compression
+app.add_middleware(AdmissionControlMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Window-From", "X-Window-To"],
 )
+app.add_middleware(CompressionMiddleware)
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in _background_tasks:
+        task.cancel()
+    # Hand the lease over immediately instead of waiting for it to lapse
+    await release_leadership()
     client.close()
\ No newline at end of file
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Offline columnar snapshot of matches, player ratings and vote tallies.
+
+Writes Parquet datasets partitioned by season and competition, one chunk at a
+time from batched cursors, so analysts can query a season without touching
+production Mongo. Reads prefer a secondary. Uses MONGO_URL / DB_NAME like the API.
+
+    python snapshot.py --out ./snapshot
+    python snapshot.py --out ./snapshot --season 2025 --competition <id>
+
+Layout: <out>/<dataset>/season=<season>/competition=<slug>/chunk-NNNNN-0.parquet
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import typer
+from pymongo import ReadPreference
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import server  # noqa: E402
+
+app = typer.Typer(add_completion=False, help=__doc__)
+
+PARTITION_COLS = ["season", "competition"]
+TS = pa.timestamp("ms", tz="UTC")
+SCHEMAS = {
+    "matches": pa.schema([
+        ("id", pa.string()), ("sourceId", pa.string()), ("sport", pa.string()), ("tournament", pa.string()),
+        ("competition_id", pa.string()), ("homeTeam", pa.string()), ("awayTeam", pa.string()),
+        ("startTime", TS), ("finalAt", TS), ("voting_open_at", TS), ("voting_close_at", TS),
+        ("status", pa.string()), ("score", pa.string()), ("archived", pa.bool_()),
+        ("season", pa.string()), ("competition", pa.string()),
+    ]),
+    "player_ratings": pa.schema([
+        ("matchId", pa.string()), ("token", pa.string()), ("player", pa.string()),
+        *[(k, pa.int16()) for k in server.PLAYER_RATING_ATTRS],
+        ("updatedAt", TS), ("season", pa.string()), ("competition", pa.string()),
+    ]),
+    "vote_tallies": pa.schema([
+        ("matchId", pa.string()), ("category", pa.string()), ("player", pa.string()), ("votes", pa.int64()),
+        ("season", pa.string()), ("competition", pa.string()),
+    ]),
+}
+
+
+def _team(t) -> Optional[str]:
+    return t.get("name") if isinstance(t, dict) else t
+
+
+def _str(v) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, (dict, list)):
+        return json.dumps(server.sanitize(v), sort_keys=True)
+    return str(v)
+
+
+class ChunkWriter:
+    # Buffers rows and writes each full chunk as its own file in every partition it touches
+    def __init__(self, root: Path, dataset: str, chunk_size: int):
+        self.root = root / dataset
+        self.schema = SCHEMAS[dataset]
+        self.chunk_size = chunk_size
+        self.rows: List[Dict] = []
+        self.chunks = 0
+        self.total = 0
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def add(self, row: Dict):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        df = pd.DataFrame.from_records(self.rows, columns=self.schema.names)
+        df.to_parquet(
+            self.root,
+            engine="pyarrow",
+            index=False,
+            schema=self.schema,
+            partition_cols=PARTITION_COLS,
+            basename_template=f"chunk-{self.chunks:05d}-{{i}}.parquet",
+        )
+        self.total += len(self.rows)
+        self.chunks += 1
+        self.rows = []
+
+
+async def _partitions(db, season: Optional[str], competition: Optional[str]) -> Dict:
+    q: Dict = {}
+    if season:
+        q["season"] = season
+    if competition:
+        if not server.ObjectId.is_valid(competition):
+            typer.echo(f"Invalid competition id: {competition}")
+            raise typer.Exit(1)
+        q["_id"] = server.ObjectId(competition)
+    return {c["_id"]: (str(c.get("season") or "unknown"), c.get("slug") or str(c["_id"])) async for c in db.competitions.find(q)}
+
+
+async def _snapshot(out: Path, season: Optional[str], competition: Optional[str], chunk_size: int, include_archive: bool):
+    db = server.client.get_database(server.db.name, read_preference=ReadPreference.SECONDARY_PREFERRED)
+    parts = await _partitions(db, season, competition)
+    if (season or competition) and not parts:
+        typer.echo("No competitions match the filter")
+        raise typer.Exit(1)
+    match_q: Dict = {"competition_id": {"$in": list(parts)}} if (season or competition) else {}
+    sources = ["matches", "matches_archive"] if include_archive else ["matches"]
+
+    # matches first: they decide the partition of every rating and tally row
+    match_part: Dict = {}
+    w = ChunkWriter(out, "matches", chunk_size)
+    for coll in sources:
+        async for m in db[coll].find(match_q).batch_size(chunk_size):
+            s, c = parts.get(m.get("competition_id")) or (str(m["startTime"].year) if m.get("startTime") else "unknown", "none")
+            match_part[m["_id"]] = (s, c)
+            w.add({
+                "id": str(m["_id"]), "sourceId": _str(m.get("sourceId")), "sport": m.get("sport"), "tournament": _str(m.get("tournament")),
+                "competition_id": _str(m.get("competition_id")), "homeTeam": _team(m.get("homeTeam")), "awayTeam": _team(m.get("awayTeam")),
+                "startTime": m.get("startTime"), "finalAt": m.get("finalAt"), "voting_open_at": m.get("voting_open_at"), "voting_close_at": m.get("voting_close_at"),
+                "status": m.get("status"), "score": _str(m.get("score")), "archived": coll != "matches", "season": s, "competition": c,
+            })
+    w.flush()
+    typer.echo(f"matches: {w.total} rows in {w.chunks} chunks")
+
+    ids = list(match_part)
+    batches = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    suffixes = ["", "_archive"] if include_archive else [""]
+
+    w = ChunkWriter(out, "player_ratings", chunk_size)
+    for batch in batches:
+        for suffix in suffixes:
+            async for r in db[f"player_ratings{suffix}"].find({"matchId": {"$in": batch}}).batch_size(chunk_size):
+                s, c = match_part[r["matchId"]]
+                w.add({
+                    "matchId": str(r["matchId"]), "token": _str(r.get("token")), "player": r.get("player"),
+                    **{k: r.get(k, 0) for k in server.PLAYER_RATING_ATTRS},
+                    "updatedAt": r.get("updatedAt"), "season": s, "competition": c,
+                })
+    w.flush()
+    typer.echo(f"player_ratings: {w.total} rows in {w.chunks} chunks")
+
+    # Category tallies plus like/dislike under the ledger's "rating" category
+    w = ChunkWriter(out, "vote_tallies", chunk_size)
+    for batch in batches:
+        for suffix in suffixes:
+            async for v in db[f"votes{suffix}"].find({"matchId": {"$in": batch}}).batch_size(chunk_size):
+                s, c = match_part[v["matchId"]]
+                for row in server._vote_rows(v):
+                    w.add({**row, "matchId": str(row["matchId"]), "season": s, "competition": c})
+            async for r in db[f"ratings{suffix}"].find({"matchId": {"$in": batch}}).batch_size(chunk_size):
+                s, c = match_part[r["matchId"]]
+                for choice in ("like", "dislike"):
+                    w.add({"matchId": str(r["matchId"]), "category": server.RATING_LEDGER_CATEGORY, "player": choice, "votes": r.get(f"{choice}s", 0), "season": s, "competition": c})
+    w.flush()
+    typer.echo(f"vote_tallies: {w.total} rows in {w.chunks} chunks")
+
+
+@app.command()
+def snapshot(
+    out: Path = typer.Option(Path("snapshot"), help="Output directory; each dataset folder is replaced"),
+    season: Optional[str] = typer.Option(None, help="Only competitions of this season"),
+    competition: Optional[str] = typer.Option(None, help="Only this competition id"),
+    chunk_size: int = typer.Option(50_000, min=1, help="Rows per Parquet chunk"),
+    include_archive: bool = typer.Option(True, help="Include archived matches and their tallies"),
+):
+    asyncio.run(_snapshot(out, season, competition, chunk_size, include_archive))
+
+
+if __name__ == "__main__":
+    app()